@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_PATH = os.path.dirname(os.path.abspath(__file__))
+PED_PATH = os.path.join(os.path.dirname(BENCH_PATH), 'ped')
+CORPUS_DIR = os.path.join(BENCH_PATH, 'corpora')
+CORPUS_BLOCK = 1 << 20
+CORPUS_BLOCKS = 16
+SIZES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'foo', 'bar', 'baz', 'fred', 'flintstone', 'wilma', 'x1',
+  'id_42', 'value', 'return', 'the', 'a', 'of', '2024-01-31', '3.14159', 'ERROR', 'warning']
+UNICODE_WORDS = ['épée', 'naïve', 'Straße', 'ελληνικά', 'кириллица', '中文字符', '日本語', '한국어',
+  'emoji😀', 'ﬁ', 'İstanbul', 'ǅemal', 'café', 'Ωmega']
+
+# (name, ped arguments), MAP stands for the path of a generated map file
+CASES = [
+  ('s', ['s/fo+/X/']),
+  ('s-groups', ['s/(\\w+) (\\w+)/\\2 \\1/']),
+  ('f', ['f/bar/BAR/']),
+  ('g', ['g/fred|wilma/']),
+  ('G', ['G/.*a.*/']),
+  ('x', ['x/ERROR/']),
+  ('X', ['X/.*a.*/']),
+  ('o', ['o/\\d+/']),
+  ('r', ['r/\\s+/']),
+  ('u', ['u/\\bf\\w+/']),
+  ('l', ['l/[A-Z]+/']),
+  ('t', ['t/\\w+/']),
+  ('c', ['c/\\w+ \\w+/']),
+  ('a-p', ['a/appended', 'p/prepended']),
+  ('i-y-d', ['i/100/inserted', 'y/200/5/replaced', 'd/-100/50']),
+  ('m', ['m/MAP']),
+  ('S', ['S/fo+/X/']),
+  ('S-span', ['S/alpha\\s+beta/AB/']),
+  ('R', ['R/\\s+/']),
+  ('O', ['O/\\d+/']),
+  ('U', ['U/\\bf\\w+/']),
+  ('A-P', ['A/appended', 'P/prepended']),
+  ('I-Y-D', ['I/100/inserted', 'Y/200/5/replaced', 'D/-100/50']),
+  ('M', ['M/MAP']),
+  ('chain-lines', ['s/foo/X/', 'g/a/', 'x/ERROR/', 'u/\\bb\\w+/', 'r/\\d/']),
+  ('chain-mixed', ['s/foo/X/', 'S/bar/Y/', 'g/a/', 'U/beta/']),
+  ('chain-edits', ['S/x1/y/', 'y/1000/5/Q', 'd/-100/50', 'i/200/W', 'S/Q/q/']),
+  ('s-first', ['-M', '1', 's/fo+/X/']),
+  ('g-first', ['--max-count', '10', 'g/fred|wilma/']),
+  ('g-literal', ['g/\\w+ fred flintstone/']),
+  ('s-literal', ['-i', 's/(\\w+) error warning/\\1 W/']),
+  ('inplace', ['-e', 's/fo+/X/']),
+  ('inplace-unchanged', ['-e', 's/zzz/X/']),
+]
+
+# (name, ped arguments) timed from a cold start on empty input, or a small FILE
+STARTUP_CASES = [
+  ('plain', ['s/a/b/']),
+  ('options', ['-i', '-F', '-f', '-', 's/a/b/', 'g/b/']),
+  ('file-S', ['-f', 'FILE', 'S/a/b/']),
+  ('insert', ['-f', 'FILE', 'i/0/x']),
+  ('delete', ['-f', 'FILE', 'd/0/1']),
+  ('help', ['-h']),
+]
+# startup results to check against, taken from ped as it was before any of the speed ups, times are
+# kept as starts of the bare interpreter so they carry over to other machines better than seconds
+STARTUP_BASELINE = os.path.join(BENCH_PATH, 'startup.json')
+# modules a plain run has no use for, and which take long enough to import to show
+STARTUP_UNUSED = ['argparse', 'datetime', 'shutil', 'json', 'tempfile', 'textwrap', 'ped_engines']
+
+EPILOG = '''
+corpora:
+  short    many short lines of words
+  long     a few lines of about 1MB each
+  crlf     short lines ending in \\r\\n
+  unicode  short lines of mostly non-ASCII words
+
+Corpora are generated once, deterministically, into benchmarks/corpora. Each case runs ped in a
+new process and keeps the fastest of the repeats, reporting MB/s and lines/s of input and the
+peak RSS of the process. `compare` exits with status 1 when any case got slower or bigger than
+the threshold allows. `startup` times ped on empty input or a small file, where starting Python
+and ped is all there is, in starts of the bare interpreter, and lists the slowest imports from
+`python -X importtime`. Bytecode is written and used whatever PYTHONDONTWRITEBYTECODE says, the
+way an installed ped runs after its first start. It exits with status 1 when a case got slower
+than benchmarks/startup.json by more than the threshold, or a plain run imports a module it
+doesn't need. The baseline was saved from ped before the speed ups, with --ped pointing at it.
+
+  $> benchmarks/bench.py run --size 16M -o before.json
+  $> benchmarks/bench.py run --size 16M --case 's*' --case 'chain-*' -o after.json
+  $> benchmarks/bench.py compare before.json after.json
+  $> benchmarks/bench.py startup
+  $> git show <commit>:ped > /tmp/ped-before
+  $> benchmarks/bench.py startup -r 40 --ped /tmp/ped-before -o benchmarks/startup.json
+'''.strip()
+
+def main(argv):
+  parser = argparse.ArgumentParser(description='benchmark ped on synthetic corpora', epilog=EPILOG,
+    formatter_class=argparse.RawDescriptionHelpFormatter)
+  sub = parser.add_subparsers(dest='action', required=True)
+  run_parser = sub.add_parser('run', help='run the benchmarks and save the results as JSON')
+  run_parser.add_argument('--size', dest='sizes', metavar='SIZE', action='append', type=parse_size,
+    help='corpus size like 1M, 64M or 1G, may be repeated, default 1M')
+  run_parser.add_argument('--corpus', dest='corpora', metavar='NAME', action='append', choices=CORPORA,
+    help='corpus to use, may be repeated, default all')
+  run_parser.add_argument('--case', dest='cases', metavar='GLOB', action='append',
+    help='only run cases with a matching name, may be repeated')
+  run_parser.add_argument('-r', '--repeat', dest='repeat', metavar='N', type=int, default=3,
+    help='runs of each case, the fastest is kept')
+  run_parser.add_argument('--ped', dest='ped', metavar='FILE', default=PED_PATH, help='ped script to benchmark')
+  run_parser.add_argument('-o', '--output', dest='output', metavar='FILE', help='JSON file for the results')
+  run_parser.add_argument('--list', dest='list', action='store_true', help='list the cases and exit')
+  compare_parser = sub.add_parser('compare', help='compare results against a baseline')
+  compare_parser.add_argument('baseline', help='JSON results to compare against')
+  compare_parser.add_argument('current', help='JSON results to check')
+  compare_parser.add_argument('-t', '--threshold', dest='threshold', metavar='RATIO', type=float, default=0.1,
+    help='allowed slow down or memory growth, 0.1 for 10%%')
+  startup_parser = sub.add_parser('startup', help='time starting ped and compare it with a baseline')
+  startup_parser.add_argument('-r', '--repeat', dest='repeat', metavar='N', type=int, default=20,
+    help='runs of each case, the fastest is kept')
+  startup_parser.add_argument('--ped', dest='ped', metavar='FILE', default=PED_PATH, help='ped script to benchmark')
+  startup_parser.add_argument('-o', '--output', dest='output', metavar='FILE', help='JSON file for the results')
+  startup_parser.add_argument('--baseline', dest='baseline', metavar='FILE', default=STARTUP_BASELINE,
+    help='JSON startup results to compare against, default benchmarks/startup.json')
+  startup_parser.add_argument('-t', '--threshold', dest='threshold', metavar='RATIO', type=float, default=0.1,
+    help='allowed slow down, 0.1 for 10%%')
+  args = parser.parse_args(argv)
+  if args.action == 'compare':
+    return compare(args)
+  if args.action == 'startup':
+    return startup(args)
+  if args.list:
+    for name, ped_args in CASES:
+      print(f'{name:20} {" ".join(ped_args)}')
+    return 0
+  results = run(args)
+  text = json.dumps(results, indent=2) + '\n'
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(text)
+  return 0
+
+def parse_size(text):
+  unit = SIZES.get(text[-1:].upper(), 1)
+  try:
+    return int(float(text[:-1] if unit > 1 else text) * unit)
+  except ValueError:
+    raise argparse.ArgumentTypeError(f'invalid size: "{text}"')
+
+def size_name(size):
+  for unit, factor in reversed(SIZES.items()):
+    if size >= factor and size % factor == 0:
+      return f'{size // factor}{unit}'
+  return str(size)
+
+def short_line(rng, words):
+  return ' '.join(rng.choice(words) for _ in range(rng.randint(1, 12)))
+
+def short_block(rng, words, ending):
+  lines = []
+  size = 0
+  while size < CORPUS_BLOCK:
+    lines.append(short_line(rng, words) + ending)
+    size += len(lines[-1])
+  return ''.join(lines)
+
+def long_block(rng, words, ending):
+  return ' '.join(rng.choice(words) for _ in range(CORPUS_BLOCK // 6)) + ending
+
+CORPORA = {
+  'short': lambda rng: short_block(rng, WORDS, '\n'),
+  'long': lambda rng: long_block(rng, WORDS, '\n'),
+  'crlf': lambda rng: short_block(rng, WORDS, '\r\n'),
+  'unicode': lambda rng: short_block(rng, UNICODE_WORDS + WORDS[:4], '\n'),
+}
+
+def corpus_path(name, size):
+  path = os.path.join(CORPUS_DIR, f'{name}-{size_name(size)}.txt')
+  if os.path.exists(path):
+    return path
+  os.makedirs(CORPUS_DIR, exist_ok=True)
+  rng = random.Random(f'{name}-{size}')
+  blocks = [CORPORA[name](rng).encode('utf-8') for _ in range(min(CORPUS_BLOCKS, max(1, size // CORPUS_BLOCK)))]
+  temp_path = path + '.tmp'
+  with open(temp_path, 'wb') as f:
+    # a few distinct blocks repeated in a random order, the regular expressions don't care
+    written = 0
+    while written + len(block := rng.choice(blocks)) <= size:
+      f.write(block)
+      written += len(block)
+    # end on a whole line, or at least a whole character
+    end = block.rfind(b'\n', 0, size - written) + 1
+    f.write(block[:end] or block[:size - written].decode('utf-8', 'ignore').encode('utf-8'))
+  os.replace(temp_path, path)
+  return path
+
+def map_path():
+  path = os.path.join(CORPUS_DIR, 'words.tsv')
+  if not os.path.exists(path):
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+      for word in WORDS + UNICODE_WORDS:
+        f.write(f'{word}\t{word.upper()}\n')
+  return path
+
+def count_lines(path):
+  with open(path, 'rb') as f:
+    return sum(block.count(b'\n') for block in iter(lambda: f.read(CORPUS_BLOCK), b''))
+
+def time_ped(ped, ped_args, path, temp_dir):
+  if '-e' in ped_args:
+    # edit a fresh copy each time, with backups kept out of the home directory
+    shutil.copyfile(path, os.path.join(temp_dir, 'edit.txt'))
+    path = os.path.join(temp_dir, 'edit.txt')
+    ped_args = ['-b', os.path.join(temp_dir, 'bak')] + ped_args
+  ped_args = [arg.replace('/MAP', '/' + map_path()) for arg in ped_args]
+  with open(os.devnull, 'wb') as out:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, ped, '-f', path] + ped_args, stdout=out, stderr=subprocess.PIPE)
+    # wait4() gives the resource usage of this child alone
+    _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+  proc.returncode = os.waitstatus_to_exitcode(status)
+  error = proc.stderr.read().decode('utf-8', 'replace').strip()
+  proc.stderr.close()
+  shutil.rmtree(os.path.join(temp_dir, 'bak'), ignore_errors=True)
+  # ru_maxrss is in kilobytes on Linux and bytes on macOS
+  peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+  return seconds, peak, error if proc.returncode else None
+
+def run(args):
+  sizes = args.sizes or [1 << 20]
+  names = args.corpora or list(CORPORA)
+  cases = [(name, ped_args) for name, ped_args in CASES
+    if not args.cases or any(fnmatch.fnmatchcase(name, pattern) for pattern in args.cases)]
+  results = {'python': sys.version.split()[0], 'platform': sys.platform, 'created': time.time(), 'results': {}}
+  with tempfile.TemporaryDirectory('_ped_bench') as temp_dir:
+    for size in sizes:
+      for corpus in names:
+        path = corpus_path(corpus, size)
+        lines = count_lines(path)
+        size_mb = os.path.getsize(path) / (1 << 20)
+        for name, ped_args in cases:
+          runs = [time_ped(args.ped, ped_args, path, temp_dir) for _ in range(max(args.repeat, 1))]
+          seconds = min(seconds for seconds, _, _ in runs)
+          peak = max(peak for _, peak, _ in runs)
+          error = runs[0][2]
+          key = f'{name}/{corpus}/{size_name(size)}'
+          results['results'][key] = {
+            'seconds': round(seconds, 4),
+            'mb_per_s': round(size_mb / seconds, 2),
+            'lines_per_s': round(lines / seconds),
+            'peak_mb': round(peak / (1 << 20), 1),
+            'error': error,
+          }
+          note = f'  {error}' if error else ''
+          print(f'{key:32} {seconds:8.3f}s {size_mb / seconds:9.1f} MB/s '
+            f'{lines / seconds:12.0f} lines/s {peak / (1 << 20):8.1f} MB{note}', flush=True)
+  return results
+
+def compare(args):
+  with open(args.baseline) as f:
+    baseline = json.load(f)['results']
+  with open(args.current) as f:
+    current = json.load(f)['results']
+  regressions = 0
+  for key in sorted(set(baseline) & set(current)):
+    before, after = baseline[key], current[key]
+    notes = []
+    if after['error'] and not before['error']:
+      notes.append(f'now fails: {after["error"]}')
+    for field, unit in [('seconds', 's'), ('peak_mb', 'MB')]:
+      if before[field] and after[field] > before[field] * (1 + args.threshold):
+        notes.append(f'{field} {before[field]}{unit} -> {after[field]}{unit} '
+          f'(+{after[field] / before[field] - 1:.0%})')
+    time_ratio = after['seconds'] / before['seconds'] if before['seconds'] else 1
+    mark = 'REGRESSION' if notes else 'ok'
+    print(f'{key:32} {time_ratio:6.2f}x  {mark}  {"; ".join(notes)}'.rstrip())
+    regressions += 1 if notes else 0
+  for name, keys in [('the baseline', set(baseline) - set(current)), ('the current results', set(current) - set(baseline))]:
+    if keys:
+      print(f'{len(keys)} case{"" if len(keys) == 1 else "s"} only in {name}')
+  print(f'{regressions} regression{"" if regressions == 1 else "s"}')
+  return 1 if regressions else 0
+
+def time_start(argv, env=None):
+  with open(os.devnull, 'wb') as out:
+    start = time.perf_counter()
+    proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=out, stderr=out, env=env)
+    _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+  return seconds, usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+def import_times(ped, ped_args, env=None):
+  proc = subprocess.run([sys.executable, '-X', 'importtime', ped] + ped_args, stdin=subprocess.DEVNULL,
+    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+  # "import time: self [us] | cumulative | name", nested imports are indented further
+  imports = {}
+  for line in proc.stderr.splitlines():
+    fields = line.split('|')
+    if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+      imports[fields[2].strip()] = (int(fields[1]), fields[2].startswith('  '))
+  return imports
+
+def startup(args):
+  env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+  with tempfile.TemporaryDirectory() as temp_dir:
+    path = os.path.join(temp_dir, 'short.txt')
+    with open(path, 'w') as f:
+      f.write('alpha\nbeta\ngamma\n')
+    cases = [('python -c pass', ['-c', 'pass'])] + [(name, [args.ped] + [path if arg == 'FILE' else arg
+      for arg in ped_args]) for name, ped_args in STARTUP_CASES]
+    best = {name: (float('inf'), 0) for name, _ in cases}
+    # an untimed first round writes the bytecode, then the cases take turns so that a busy moment
+    # slows all of them
+    for name, argv in cases:
+      time_start([sys.executable] + argv, env)
+    for _ in range(max(args.repeat, 1)):
+      for name, argv in cases:
+        seconds, peak = time_start([sys.executable] + argv, env)
+        best[name] = (min(best[name][0], seconds), max(best[name][1], peak))
+  bare = best['python -c pass'][0]
+  results = {'python': sys.version.split()[0], 'platform': sys.platform, 'created': time.time(),
+    'bare_seconds': round(bare, 4), 'results': {}}
+  print(f'{"python -c pass":20} {bare * 1000:8.1f}ms')
+  for name, ped_args in STARTUP_CASES:
+    seconds, peak = best[name]
+    results['results'][f'startup/{name}'] = {'seconds': round(seconds, 4), 'ratio': round(seconds / bare, 3),
+      'peak_mb': round(peak / (1 << 20), 1), 'error': None}
+    print(f'{name:20} {seconds * 1000:8.1f}ms {seconds / bare:6.2f}x  {" ".join(ped_args)}')
+  imports = import_times(args.ped, STARTUP_CASES[0][1], env)
+  print('slowest imports of a plain run:')
+  top = sorted(((micros, name) for name, (micros, nested) in imports.items() if not nested), reverse=True)
+  for micros, name in top[:8]:
+    print(f'  {name:28} {micros / 1000:8.1f}ms')
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(json.dumps(results, indent=2) + '\n')
+  failures = []
+  if args.baseline and os.path.exists(args.baseline) and args.baseline != args.output:
+    with open(args.baseline) as f:
+      baseline = json.load(f)['results']
+    for key, result in results['results'].items():
+      if key in baseline and result['ratio'] > baseline[key]['ratio'] * (1 + args.threshold):
+        failures.append(f'{key} takes {result["ratio"]}x the bare interpreter, {baseline[key]["ratio"]}x in the '
+          f'baseline (+{result["ratio"] / baseline[key]["ratio"] - 1:.0%})')
+  unused = [name for name in STARTUP_UNUSED if name in imports]
+  if unused:
+    failures.append(f'a plain run imports {", ".join(unused)}')
+  for failure in failures:
+    print(f'REGRESSION  {failure}')
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
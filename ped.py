@@ -0,0 +1,1837 @@
+import functools
+import os
+import re
+import sys
+from enum import IntEnum
+
+LINE_SUB = 's'
+FILE_SUB = 'S'
+LINE_FIXED_SUB = 'f'
+FILTER = 'g'
+LINE_FILTER = 'G'
+EXCLUDE = 'x'
+LINE_EXCLUDE = 'X'
+LINE_ONLY = 'o'
+FILE_ONLY = 'O'
+LINE_REMOVE = 'r'
+FILE_REMOVE = 'R'
+LINE_UPPER = 'u'
+FILE_UPPER = 'U'
+LINE_LOWER = 'l'
+FILE_LOWER = 'L'
+LINE_TITLE = 't'
+FILE_TITLE = 'T'
+LINE_CAPITALIZE = 'c'
+FILE_CAPITALIZE = 'C'
+LINE_PREPEND = 'p'
+FILE_PREPEND = 'P'
+LINE_APPEND = 'a'
+FILE_APPEND = 'A'
+LINE_INSERT = 'i'
+FILE_INSERT = 'I'
+LINE_REPLACE = 'y'
+FILE_REPLACE = 'Y'
+LINE_DELETE = 'd'
+FILE_DELETE = 'D'
+LINE_MAP = 'm'
+FILE_MAP = 'M'
+ALL_FILTERS = [FILTER, LINE_FILTER, EXCLUDE, LINE_EXCLUDE, LINE_ONLY, LINE_REMOVE]
+LINE_XFORMS = [LINE_UPPER, LINE_LOWER, LINE_TITLE, LINE_CAPITALIZE]
+FILE_XFORMS = [FILE_UPPER, FILE_LOWER, FILE_TITLE, FILE_CAPITALIZE]
+RESPLIT_OPS = [LINE_SUB, LINE_FIXED_SUB, LINE_MAP, LINE_APPEND, LINE_PREPEND, LINE_INSERT]
+TEXT_OPS = [FILE_SUB, FILE_REMOVE, FILE_ONLY, FILE_APPEND, FILE_PREPEND, FILE_INSERT, FILE_REPLACE,
+  FILE_DELETE, FILE_MAP] + FILE_XFORMS
+XFORM_NAMES = {LINE_UPPER: 'upper', LINE_LOWER: 'lower', LINE_TITLE: 'title', LINE_CAPITALIZE: 'capitalize'}
+
+# line boundaries recognized by str.splitlines() besides \n
+LINE_BREAKS = '\r\v\f\x1c\x1d\x1e\x85\u2028\u2029'
+STREAM_BLOCK = 1 << 16
+STREAM_BATCH = 1024
+STREAM_PIECE = 1 << 10
+PREFILTER_MIN = 3
+PREFILTER_SPARSE = 8
+PREFILTER_SAMPLE = 1 << 12
+PREFILTER_OPS = ALL_FILTERS + LINE_XFORMS + [LINE_SUB, LINE_FIXED_SUB]
+WINDOW_OPS = [FILE_SUB, FILE_REMOVE, FILE_ONLY, FILE_APPEND, FILE_PREPEND, FILE_MAP] + FILE_XFORMS
+MAP_BLOCK = 1 << 24
+MAP_PIECE = 1 << 20
+EDIT_LINES = 'lines'
+EDIT_CHARS = 'chars'
+INDEX_BLOCK = 1 << 12
+PARALLEL_CHUNK = 1 << 24
+DIFF_CONTEXT = 3
+REGEX_CACHE = 256
+CACHE_SIZE = 256
+
+ANSI_BLACK = '\u001b[30m'
+ANSI_RED = '\u001b[31m'
+ANSI_GREEN = '\u001b[32m'
+ANSI_YELLOW = '\u001b[33m'
+ANSI_BLUE = '\u001b[34m'
+ANSI_MAGENTA = '\u001b[35m'
+ANSI_CYAN = '\u001b[36m'
+ANSI_WHITE = '\u001b[37m'
+ANSI_RESET = '\u001b[0m'
+ANSI_BOLD = '\u001b[1m'
+ANSI_UNDERLINE = '\u001b[4m'
+ANSI_REVERSE = '\u001b[7m'
+
+# ¹²³⁴⁵⁶⁷⁸⁹⁰
+
+DESCRIPTION = 'make edit to text file, line endings will be normalized to the os convention'
+def main(argv):
+  args = parse_args(argv)
+  if args.profile:
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+      profiler.runcall(serve if args.serve else run, args)
+    finally:
+      profiler.dump_stats(args.profile)
+  elif args.serve:
+    serve(args)
+  else:
+    run(args)
+
+def parse_args(argv):
+  # argparse and the parser take longer to load than a short edit takes to run, so the usual
+  # command lines are parsed from the table of options and argparse is left for the rest
+  args = quick_parse(argv)
+  return args if args is not None else get_parser().parse_args(argv)
+
+@functools.lru_cache(maxsize=None)
+def get_parser():
+  import argparse
+  parser = argparse.ArgumentParser(description=DESCRIPTION, epilog=engines().EPILOG,
+    formatter_class=engines().help_formatter())
+  add_arguments(parser)
+  return parser
+
+class OptionTable:
+  # stands in for the parser to collect what add_arguments declares
+  def __init__(self):
+    self.options = {}
+    self.defaults = {}
+
+  def add_argument(self, *flags, dest=None, action='store', default=None, const=None, type=None, nargs=None,
+      choices=None, **kwargs):
+    if not flags[0].startswith('-'):
+      self.defaults[flags[0]] = []
+      return
+    self.defaults.setdefault(dest, default)
+    for flag in flags:
+      self.options[flag] = (dest, action, const, type, nargs, choices)
+
+@functools.lru_cache(maxsize=None)
+def get_option_table():
+  table = OptionTable()
+  add_arguments(table)
+  return table
+
+def quick_parse(argv):
+  # options followed by commands, without abbreviations or flags run together, anything else
+  # (help and errors included) returns None for argparse
+  import types
+  table = get_option_table()
+  values = {dest: list(value) if isinstance(value, list) else value for dest, value in table.defaults.items()}
+  args = iter(argv)
+  for arg in args:
+    if arg == '--':
+      values['commands'] = list(args)
+      if '--' in values['commands']:
+        return None
+      break
+    if arg[:1] != '-' or arg == '-':
+      values['commands'] = [arg, *args]
+      if any(command[:1] == '-' for command in values['commands']):
+        return None
+      break
+    flag, equals, value = arg.partition('=') if arg.startswith('--') else (arg, '', None)
+    if flag not in table.options:
+      return None
+    dest, action, const, type, nargs, choices = table.options[flag]
+    if action in ('store_true', 'store_false', 'store_const'):
+      if equals:
+        return None
+      values[dest] = const if action == 'store_const' else action == 'store_true'
+      continue
+    if not equals:
+      value = next(args, None)
+      if value is None or (value[:1] == '-' and value != '-'):
+        return None
+    try:
+      value = type(value) if type else value
+    except ValueError:
+      return None
+    if choices is not None and value not in choices:
+      return None
+    value = [value] if nargs == 1 else value
+    values[dest] = (values[dest] or []) + [value] if action == 'append' else value
+  return types.SimpleNamespace(**values)
+
+def add_arguments(parser):
+  parser.add_argument('commands', metavar='COMMAND', type=str, nargs='*', help='edit command')
+  parser.add_argument('-f', '--filepath', metavar='FILE', dest='paths', action='append', type=str, 
+      default=None, help='file to edit, `-` for stdin, may be repeated and may be a glob pattern')
+  parser.add_argument('-e', '--in-place', dest='inplace', action='store_true', default=False, 
+      help='edit in place, update source file while making backup')
+  parser.add_argument('-i', '--ignore-case', dest='insensitive', action='store_const', default=0, 
+      const=re.IGNORECASE, help='case insensitive matching')
+  parser.add_argument('-n', '--normalize', dest='normalize', action='store_true', default=False, 
+      help='normalize line endings, even when using multiline')
+  parser.add_argument('-F', '--fixed', dest='fixed', action='store_true', default=False, 
+      help='treat regular expression as a fixed string by quoting all meta char')
+  parser.add_argument('-m', '--multiline', dest='multiline', action='store_const', default=0, 
+      const=re.MULTILINE, help=r'`^` and `$` match beginning and end of lines, \A and \Z match beginning and end of file')
+  parser.add_argument('-d', '--dotall', dest='dotall', action='store_const', default=0, 
+      const=re.DOTALL, help='dot `.` will match any character including line endings')
+  parser.add_argument('-a', '--ascii', dest='ascii', action='store_const', default=0, 
+      const=re.ASCII, help=r'ascii mode where \w, \W, \b, \B, \d, \D, \s and \S only match ASCII characters')
+  parser.add_argument('-b', '--backup-path', metavar='DIR', dest='backup_dir', action='store', type=str, nargs=1,
+      default='~/.ped-backups', help='backup directory')
+  parser.add_argument('-E' , '--line-ending', metavar='CHAR', dest='ending', action='store',
+      default=os.linesep, help='line ending to be used instead of platform default')
+  parser.add_argument('-Z' , '--no-eof', dest='eof', action='store_false',
+      default=True, help='suppress line ending on last line/end of file')
+  parser.add_argument('-M' , '--max-substitutions', metavar='NUMBER', dest='maxsub', action='store', type=int,
+      default=0, help='maximum total number of substitutions per command')
+  parser.add_argument('-L' , '--line-max-substitutions', metavar='NUMBER', dest='maxlinesub', action='store', type=int,
+      default=0, help='maximum total number of substitutions per line (for each command)')
+  parser.add_argument('--max-count', metavar='N', dest='maxcount', action='store', type=int, default=0,
+      help='keep at most N lines with each `g`, `G`, `x`, `X` and `o` command, reading stops once a filter has '
+      'kept all it may (like grep -m)')
+  parser.add_argument('--force-color', dest='color', default=None, action='store_false',
+      help="force use of ANSI color adornment even if output stream does not appear to support it")    
+  parser.add_argument('--no-color', dest='color', default=None, action='store_true',
+      help="disable ANSI color adornment even if output stream appears to support it")    
+  parser.add_argument('-R', '--recursive', dest='recursive', action='store_true', default=False,
+      help='edit all files in directories given with -f, including subdirectories')
+  parser.add_argument('--include', metavar='GLOB', dest='include', action='append', default=[],
+      help='only edit files matching the glob, may be repeated')
+  parser.add_argument('--exclude', metavar='GLOB', dest='exclude', action='append', default=[],
+      help='skip files and directories matching the glob, may be repeated')
+  parser.add_argument('-j', '--jobs', metavar='N', dest='jobs', action='store', type=int, default=1,
+      help='number of processes used to edit multiple files, 0 for one per CPU')
+  parser.add_argument('--parallel', metavar='N', dest='parallel', action='store', type=int, default=0,
+      help='edit a single large file in chunks of lines over N processes, for commands that edit one line at '
+      'a time')
+  parser.add_argument('--buffered', dest='buffered', action='store_true', default=False,
+      help='read the entire input before editing instead of streaming it or memory mapping the file')
+  parser.add_argument('--map', metavar='FILE', dest='maps', action='append', default=[],
+      help='replace the fixed strings listed in the map FILE within lines, like a `m` command after the others')
+  parser.add_argument('--window', metavar='N', dest='window', action='store', type=int, default=0,
+      help='run whole file commands over a sliding window of N characters instead of the entire input, '
+      'a match (including any lookahead) or a lookbehind longer than the window is an error')
+  parser.add_argument('--timeout', metavar='SECONDS', dest='timeout', action='store', type=float, default=0,
+      help='stop with an error when a step of the edit (see --explain) runs longer than SECONDS, a streamed step '
+      'includes reading and writing the text, with --parallel each chunk has the time')
+  parser.add_argument('--explain', dest='explain', action='store_true', default=False,
+      help='print how the commands will be executed instead of running them')
+  parser.add_argument('--edits', metavar='FORMAT', dest='report', action='store', choices=['json'], default=None,
+      help='write only the changes to the input instead of the edited text, as a JSON list of edits, '
+      'see Edit lists below')
+  parser.add_argument('--diff', dest='report', action='store_const', const='diff',
+      help='write only the changes to the input, as a unified diff')
+  parser.add_argument('--stats', dest='stats', action='store_const', const='text', default=None,
+      help='report the time taken, the matches and the size of the data in and out of every command to stderr, '
+      'the edit is run buffered')
+  parser.add_argument('--stats-json', dest='stats', action='store_const', const='json',
+      help='like --stats but as JSON')
+  parser.add_argument('--profile', metavar='FILE', dest='profile', action='store', default=None,
+      help='write a cProfile dump of the whole run to FILE, to be read with the pstats module')
+  parser.add_argument('--cache', dest='cache', action='store_true', default=False,
+      help='keep the text after each chain of commands in memory and start from the longest one a run begins with, '
+      'the edit is run buffered, see Server mode below')
+  parser.add_argument('--cache-dir', metavar='DIR', dest='cache_dir', action='store', default=None,
+      help='like --cache, and keep the texts in DIR as well')
+  parser.add_argument('--cache-size', metavar='MB', dest='cache_size', action='store', type=int, default=CACHE_SIZE,
+      help=f'the most megabytes of text --cache keeps in memory and --cache-dir on disk, {CACHE_SIZE} by default')
+  parser.add_argument('--serve', dest='serve', action='store_true', default=False,
+      help='read JSON edit requests from stdin one per line and write a JSON response line for each, '
+      'see Server mode below')
+
+def run(args):
+  # a NUL delimiter can't be part of the path
+  args.commands += [f'{LINE_MAP}\0{path}' for path in args.maps]
+  args.cache = prefix_cache or (engines().PrefixCache(args.cache_dir, args.cache_size) if args.cache or args.cache_dir else None)
+  # reading, editing and writing can only be timed apart when they don't overlap, and only a
+  # buffered edit has the text after each command to cache
+  args.buffered = args.buffered or bool(args.stats) or args.cache is not None
+
+  commands = compile_commands(args)
+  if not args.timeout:
+    for cmd in commands:
+      if cmd.backtracks:
+        print(f'Warning: the "{cmd.item}" command has a repeat inside a repeat, which can make a match take very '
+          'long to fail, --timeout limits the time', file=sys.stderr)
+  plan = build_plan(args, commands)
+  if args.explain:
+    sys.stdout.write(engines().explain_plan(args, plan))
+    return
+
+  paths = expand_paths(args)
+  if paths is None:
+    args.path = args.paths[0] if args.paths else '-'
+    return edit(args, plan)
+  return engines().edit_batch(args, plan, paths)
+
+prefix_cache = None
+
+def serve(args):
+  import json
+  global prefix_cache
+  # one cache for all the requests
+  prefix_cache = engines().PrefixCache(args.cache_dir, args.cache_size) if args.cache or args.cache_dir else None
+  try:
+    for line in sys.stdin:
+      if line.strip():
+        sys.stdout.write(json.dumps(serve_request(line)) + '\n')
+        sys.stdout.flush()
+  finally:
+    prefix_cache = None
+
+def serve_request(line):
+  import contextlib
+  import io
+  import json
+  stdin = sys.stdin
+  out, err = io.StringIO(), io.StringIO()
+  response = {}
+  try:
+    request = json.loads(line)
+    if not isinstance(request, dict):
+      raise PedError('Error: a request must be a JSON object', PedErrorTypes.PED_OTHER_ERROR)
+    if 'id' in request:
+      response['id'] = request['id']
+    paths = request.get('paths', [request['path']] if 'path' in request else [])
+    argv = [*request.get('args', []), *[f'--filepath={path}' for path in paths], '--', *request.get('commands', [])]
+    sys.stdin = io.StringIO(request.get('text', ''))
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+      try:
+        args = parse_args(argv)
+      except SystemExit as e:
+        # -h exits without an error, its help is the output
+        if e.code:
+          lines = err.getvalue().strip().splitlines()
+          raise PedError(lines[-1] if lines else f'Error: the arguments exited with status {e.code}',
+            PedErrorTypes.PED_OTHER_ERROR)
+        args = None
+      if args and args.serve:
+        raise PedError('Error: --serve can\'t be used in a request', PedErrorTypes.PED_OTHER_ERROR)
+      changed = run(args) if args else False
+    response['output'] = out.getvalue()
+    if changed is None and 'path' in vars(args):
+      # only buffered edits compare as they go
+      text = get_file_contents(args.path) if args.path != '-' else request.get('text', '')
+      changed = response['output'] != text
+    response['changed'] = changed
+    if prefix_cache:
+      response['cache'] = prefix_cache.figures()
+  except Exception as e:
+    # whatever goes wrong is the answer to this request, the next one is still served
+    e = ped_error(e) if not isinstance(e, json.JSONDecodeError) else \
+      PedError(f'Error: the request is not valid JSON - {e.msg}', PedErrorTypes.PED_OTHER_ERROR)
+    type = PedErrorTypes(e.type)
+    response.update(error=e.msg, type=type.name, code=int(type))
+  finally:
+    sys.stdin = stdin
+  if err.getvalue():
+    response['messages'] = err.getvalue()
+  return response
+
+def edit(args, plan, out=None):
+  if args.report:
+    return engines().edit_report(args, plan, out or sys.stdout)
+  if args.inplace:
+    with InPlaceWriter(args) as writer:
+      write_output(args, plan, writer)
+    return writer.changed
+  return write_output(args, plan, out or sys.stdout)
+
+def write_output(args, plan, out):
+  if is_parallel(args, plan) and engines().edit_parallel(args, plan, out):
+    return None
+  if is_streamable(args, plan):
+    lines = LineSource(read_blocks(args))
+    with TimeLimit(args, plan[0]):
+      # normalizing without a final line ending loses a trailing empty line
+      if args.normalize and not args.eof:
+        write_lines(args, plan[0].run(args, drop_last_empty(lines)), out)
+      else:
+        write_lines(args, plan[0].run(args, lines, source=lines), out)
+    return None
+  if args.path != '-' and is_mappable(args, plan):
+    with TimeLimit(args, plan[0]):
+      if edit_mapped(args, plan[0], out):
+        return None
+  if is_windowed(args, plan):
+    # the steps run interleaved, block by block
+    with TimeLimit(args, *plan):
+      for block in engines().run_windowed(args, plan):
+        out.write(block)
+    return None
+
+  stats = engines().Stats(args) if args.stats else None
+  contents = read_contents(args)
+  if stats:
+    stats.mark('read')
+  output = edit_text(args, plan, contents, stats)
+  out.write(output)
+  if stats:
+    stats.mark('write')
+    stats.report(args)
+  return output != contents
+
+def read_contents(args):
+  return sys.stdin.read() if args.path == '-' else get_file_contents(args.path)
+
+def edit_text(args, plan, contents, stats=None):
+  output = ''.join(join_blocks(args, iter_lines(args, contents))) if args.normalize else contents
+  commands = plan_commands(plan)
+  if not args.cache or not commands:
+    return get_string(args, run_plan(args, plan, output, stats))
+  keys = args.cache.keys(args, contents, commands)
+  done, cached = args.cache.find(keys)
+  output = output if cached is None else cached
+  # the last command is run on its own, as it's the one that changes while a chain is typed
+  for end in sorted({len(commands) - 1, len(commands)}):
+    if end > done:
+      plan = build_plan(args, commands[done:end], is_tainted(commands[:done]))
+      output = run_plan(args, plan, output, stats)
+      args.cache.store(keys[end - 1], output)
+      done = end
+  return get_string(args, output)
+
+def run_plan(args, plan, output, stats=None):
+  for step in plan:
+    with TimeLimit(args, step):
+      output = stats.apply(args, step, output) if stats else step.apply(args, output)
+  return output
+
+class TimeLimit:
+  # re checks for signals while it backtracks, so an alarm stops a runaway match as well
+  def __init__(self, args, *steps):
+    self.seconds = args.timeout
+    self.commands = plan_commands(steps)
+
+  def __enter__(self):
+    if self.seconds:
+      import signal
+      if not hasattr(signal, 'setitimer'):
+        raise PedError('Error: --timeout is not supported on this platform', PedErrorTypes.PED_OTHER_ERROR)
+      self.handler = signal.signal(signal.SIGALRM, self.expired)
+      signal.setitimer(signal.ITIMER_REAL, self.seconds)
+    return self
+
+  def __exit__(self, type, value, traceback):
+    if self.seconds:
+      import signal
+      signal.setitimer(signal.ITIMER_REAL, 0)
+      signal.signal(signal.SIGALRM, self.handler)
+
+  def expired(self, signum, frame):
+    items = ', '.join(f'"{cmd.item}"' for cmd in self.commands)
+    raise PedError(f'Error: {items} ran longer than the --timeout of {self.seconds:g} seconds',
+      PedErrorTypes.PED_TIMEOUT_ERROR)
+
+class InPlaceWriter:
+  # compares the output with the file as it is written and only starts a temp file next to it
+  # at the first difference, the temp file then atomically replaces the file
+  def __init__(self, args):
+    self.args = args
+    self.path = os.path.realpath(args.path)
+    self.original = None
+    self.same = 0
+    self.temp = None
+    self.temp_path = None
+    self.changed = False
+
+  def __enter__(self):
+    self.original = open(self.path, 'rb')
+    return self
+
+  def write(self, text):
+    data = (text if os.linesep == '\n' else text.replace('\n', os.linesep)).encode('utf-8')
+    if self.temp is None:
+      if self.original.read(len(data)) == data:
+        self.same += len(data)
+        return
+      self.open_temp()
+    self.temp.write(data)
+
+  def open_temp(self):
+    import tempfile
+    fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path),
+      prefix=f'.{os.path.basename(self.path)}.', suffix='.tmp')
+    self.temp = os.fdopen(fd, 'wb')
+    self.original.seek(0)
+    left = self.same
+    while left:
+      left -= self.temp.write(self.original.read(min(left, STREAM_BLOCK)))
+
+  def __exit__(self, type, value, traceback):
+    try:
+      if type is None:
+        # output that stops short of the end of the file is a change too
+        if self.temp is None and self.original.read(1):
+          self.open_temp()
+        if self.temp is not None:
+          self.temp.close()
+          self.replace()
+          self.changed = True
+    finally:
+      self.original.close()
+      if self.temp is not None:
+        self.temp.close()
+        if os.path.exists(self.temp_path):
+          os.unlink(self.temp_path)
+    return False
+
+  def replace(self):
+    import shutil
+    st = os.stat(self.path)
+    os.chmod(self.temp_path, st.st_mode & 0o7777)
+    # replacing the file would split it from its other hard links or change its owner, then the
+    # content is copied over the file instead
+    atomic = st.st_nlink == 1 and keep_owner(self.temp_path, st)
+    backup_file(self.args, self.path, link=atomic)
+    if atomic:
+      os.replace(self.temp_path, self.path)
+    else:
+      shutil.copyfile(self.temp_path, self.path)
+
+def keep_owner(path, st):
+  if not hasattr(os, 'chown'):
+    return True
+  tst = os.stat(path)
+  if (tst.st_uid, tst.st_gid) == (st.st_uid, st.st_gid):
+    return True
+  try:
+    os.chown(path, st.st_uid, st.st_gid)
+    return True
+  except PermissionError:
+    return False
+
+def backup_file(args, path, link=True):
+  import datetime
+  import shutil
+  raw_dir = args.backup_dir[0] if isinstance(args.backup_dir, list) else args.backup_dir
+  backup_dir = os.path.expanduser(raw_dir)
+  if not os.path.isdir(backup_dir):
+    os.makedirs(backup_dir, exist_ok=True)
+  if not os.path.isdir(backup_dir):
+    raise NotADirectoryError(f'Backup dir does not exist: {backup_dir}')
+  backup_name = os.path.basename(args.path)
+  ts = datetime.datetime.now().isoformat(timespec="seconds")
+  n = 0
+  while n < 1000:
+    # files with the same name from different directories are backed up in the same second
+    # by batch runs, the name is claimed so parallel workers can't pick it too
+    suffix = f'-{ts}' if n == 0 else f'-{ts}-{n}'
+    backup_path = os.path.join(backup_dir, re.sub(r'((\.[^.]+)?$)', f'{suffix}\\1', backup_name, 1))
+    try:
+      if link:
+        os.link(path, backup_path)
+      else:
+        with open(path, 'rb') as src, open(backup_path, 'xb') as dst:
+          shutil.copyfileobj(src, dst)
+      return backup_path
+    except FileExistsError:
+      n += 1
+    except OSError:
+      if not link:
+        raise
+      # no hard links to another file system, copy the file instead
+      link = False
+  raise FileExistsError(f'Backup file already exists: {backup_path}')
+
+def expand_paths(args):
+  # returns None for a single file (or stdin) so it keeps streaming and its usual output
+  paths = args.paths or ['-']
+  globbing = any(is_glob(path) for path in paths)
+  if len(paths) == 1 and not globbing and not args.recursive:
+    return None
+  if '-' in paths:
+    raise PedError('Error: stdin `-` can not be combined with other files', PedErrorTypes.PED_OTHER_ERROR)
+  import glob
+  found = []
+  for path in paths:
+    matches = sorted(glob.glob(path, recursive=True)) if is_glob(path) else [path]
+    if not matches:
+      # fails like a file that isn't there
+      found.append(path)
+    for match in matches:
+      if args.recursive and os.path.isdir(match):
+        found += walk_files(args, match)
+      elif is_included(args, match):
+        found.append(match)
+  return list(dict.fromkeys(found))
+
+def is_glob(path):
+  # a file that is there is taken as it is, even with glob characters in its name
+  return any(c in path for c in '*?[') and not os.path.exists(path)
+
+def is_included(args, path, dir=False):
+  import fnmatch
+  # patterns with a slash match the whole path, others just the name
+  name = os.path.basename(os.path.normpath(path))
+  matches = lambda pattern: fnmatch.fnmatch(path if '/' in pattern else name, pattern)
+  if any(matches(pattern) for pattern in args.exclude):
+    return False
+  return dir or not args.include or any(matches(pattern) for pattern in args.include)
+
+def walk_files(args, top):
+  files = []
+  for dirpath, dirnames, filenames in os.walk(top):
+    dirnames[:] = sorted(d for d in dirnames if is_included(args, os.path.join(dirpath, d), dir=True))
+    files += [path for path in (os.path.join(dirpath, f) for f in sorted(filenames)) if is_included(args, path)]
+  return files
+
+worker_plan = None
+
+def init_worker(args):
+  global worker_plan
+  worker_plan = (args, build_plan(args, compile_commands(args)))
+
+def edit_file_worker(path):
+  return engines().edit_file(*worker_plan, path)
+
+def join_lines(args, lines):
+  return args.ending.join(lines) + (args.ending if len(lines) and args.eof else '') 
+
+def get_lines(args, data):
+  return data if isinstance(data, list) else data.splitlines()
+
+def get_string(args, data):
+  return join_lines(args, data) if isinstance(data, list) else data
+
+def get_normalized_lines(args, data):
+  return get_lines(args, get_string(args, data))
+
+def iter_lines(args, data):
+  # a str is split a block at a time so its lines never all exist at once
+  if isinstance(data, list):
+    return iter(data)
+  return LineSource(data[i:i + STREAM_BLOCK] for i in range(0, len(data), STREAM_BLOCK))
+
+def param_str(cmd, sep='/'):
+  str1, *_ = f'{cmd[2:]}{sep}'.split(sep, 2)
+  return str1
+
+def param_regexp(cmd, sep='/'):
+  str1 = param_str(cmd, sep)
+  return str1
+
+def param_str_str(cmd, sep='/'):
+  (str1,str2,*_) = f'{cmd[2:]}{sep}'.split(sep,2)
+  return str1, str2
+
+def param_num_str(cmd, sep='/'):
+  (num,str,*_) = f'{cmd[2:]}{sep}'.split(sep,2)
+  num = num.strip()
+  if not re.match(r'^-?\d+$', num):
+    raise ValueError(f'Expected a numeric parameter: "{num}"')
+  return int(num), str
+
+def param_num_num_str(cmd, sep='/'):
+  (num1, num2, str, *_) = f'{cmd[2:]}{sep}'.split(sep,3)
+  num1 = num1.strip()
+  if not re.match(r'^-?\d+$', num1):
+    raise ValueError(f'Expected a numeric parameter: "{num1}"')
+  num2 = num2.strip()
+  if not re.match(r'^-?\d+$', num2):
+    raise ValueError(f'Expected a numeric parameter: "{num2}"')
+  return int(num1), int(num2), str
+
+def param_num_num(cmd, sep='/'):
+  (num1, num2,*_) = f'{cmd[2:]}{sep}'.split(sep,2)
+  num1 = num1.strip()
+  if not re.match(r'^-?\d+$', num1):
+    raise ValueError(f'Expected a numeric parameter: "{num1}"')
+  num2 = num2.strip()
+  if not re.match(r'^-?\d+$', num2):
+    raise ValueError(f'Expected a numeric parameter: "{num2}"')
+  return int(num1), int(num2)
+
+def compile_commands(args):
+  return [Command(args, item) for item in args.commands]
+
+@functools.lru_cache(maxsize=REGEX_CACHE)
+def compile_regex(pattern, flags):
+  # re has a cache of its own, but it drops the oldest pattern rather than the least recently used
+  return re.compile(pattern, flags)
+
+def build_plan(args, commands, tainted=False):
+  # adjacent line-local commands are fused into a single pass over the lines, once a command
+  # leaves line breaks other than \n inside a line the commands that re-split lines have to run
+  # on their own until the lines are split afresh
+  plan = []
+  for cmd in commands:
+    if cmd.op in TEXT_OPS:
+      tainted = False
+    # runs of line number or character position edits share one piece table
+    joins = plan and isinstance(plan[-1], EditPass) and plan[-1].edits == cmd.edits
+    if cmd.edits and (joins or not cmd.line_local):
+      if joins:
+        plan[-1].commands.append(cmd)
+      else:
+        plan.append(EditPass(cmd.edits, [cmd]))
+      tainted = tainted or cmd.taints
+    elif cmd.line_local and not (tainted and cmd.op in RESPLIT_OPS):
+      if plan and isinstance(plan[-1], LinePass):
+        plan[-1].commands.append(cmd)
+      else:
+        plan.append(LinePass([cmd], clean=not tainted))
+    else:
+      plan.append(cmd)
+      tainted = tainted or cmd.taints
+  return plan
+
+def is_tainted(commands):
+  # whether build_plan would still have the lines tainted after the commands
+  tainted = False
+  for cmd in commands:
+    tainted = (tainted and cmd.op not in TEXT_OPS) or cmd.taints
+  return tainted
+
+def plan_commands(plan):
+  return [cmd for step in plan for cmd in ([step] if isinstance(step, Command) else step.commands)]
+
+def run_command(args, data, cmd):
+  op = cmd.op
+  if op in [FILE_SUB, FILE_REMOVE, FILE_MAP]:
+    return file_sub(args, data, cmd)
+  elif op == FILE_ONLY:
+    return file_only(args, data, cmd)
+  elif op in [LINE_SUB, LINE_FIXED_SUB, LINE_MAP]:
+    return line_sub(args, data, cmd)
+  elif op in ALL_FILTERS or op in LINE_XFORMS:
+    return LinePass([cmd]).apply(args, data)
+  elif op in FILE_XFORMS:
+    return xform_file(args, data, cmd)
+  elif op in [LINE_APPEND, LINE_PREPEND]:
+    return append_prepend_line(args, data, cmd)
+  elif op in [FILE_APPEND, FILE_PREPEND]:
+    return append_prepend_characters(args, data, cmd)
+  elif cmd.edits:
+    return EditPass(cmd.edits, [cmd]).apply(args, data)
+  elif op == LINE_INSERT:
+    return insert_line(args, data, cmd)
+  else:
+    raise ValueError(f'Unknown command: "{cmd.item}" from the "{cmd.item}" command')
+
+def insert_line(args, data, cmd):
+  lines = get_lines(args, data)
+  index, text = cmd.index, cmd.text
+  if index<0:
+    count = len(lines)
+    index = max(count + index, 0)
+  lines.insert(index, text)
+  return get_normalized_lines(args, lines) if '\n' in text else lines
+
+def append_prepend_line(args, data, cmd):
+  lines = get_lines(args, data)
+  string = cmd.text
+  if cmd.op == LINE_APPEND:
+    lines.append(string)
+  else:
+    lines.insert(0, string)
+  return get_normalized_lines(args, lines) if '\n' in string else lines
+
+def append_prepend_characters(args, data, cmd):
+  string = cmd.text
+  if cmd.op == FILE_APPEND:
+    return get_string(args, data) + string
+  return string + get_string(args, data)
+
+def xform_file(args, data, cmd):
+  return cmd.regex.sub(cmd.repl, get_string(args, data), count=args.maxsub)
+
+def xform(match, op):
+  if op == 'u' or op == 'U':
+    return match[0].upper()
+  elif op == 'l' or op == 'L':
+    return match[0].lower()
+  elif op == 't' or op == 'T':
+    return match[0].title()
+  elif op == 'c' or op == 'C':
+    return match[0].capitalize()
+  else: 
+    raise ValueError(f'Unknown command: "{op}"')
+
+def line_sub(args, data, cmd):
+  resplit = False
+  lines = get_lines(args, data)
+  regex, r = cmd.regex, cmd.repl
+  if args.maxsub > 0:
+    maxsub = args.maxsub
+    for i, line in enumerate(lines):
+      max = maxsub if args.maxlinesub == 0 else min(maxsub, args.maxlinesub)
+      lines[i], count = regex.subn(r, line, count=max)
+      maxsub -= count
+      if (count):
+        if '\n' in lines[i]:
+          resplit = True
+      if maxsub <= 0:
+        break
+    return get_normalized_lines(args, lines) if resplit else lines
+  else:
+    resplit = False
+    new_lines = []
+    for line in lines:
+      new_lines.append(new_line := regex.sub(r, line, count=args.maxlinesub))
+      resplit = resplit or '\n' in new_line
+    return get_normalized_lines(args, new_lines) if resplit else new_lines
+
+def file_sub(args, data, cmd):
+  return cmd.regex.sub(cmd.repl, get_string(args, data), count=args.maxsub)
+
+def file_only(args, data, cmd):
+  return ''.join([match[0] for match in cmd.regex.finditer(get_string(args, data))])
+
+def is_line_safe(text, template=False):
+  # text that could put a line break other than \n inside a line can't be fused or streamed,
+  # the buffered path may re-split such a line later based on what happens to other lines
+  if any(c in LINE_BREAKS for c in text):
+    return False
+  return not template or not re.search(r'\\([rvfxuUN0]|[1-7][0-7]{2})', text)
+
+def is_streamable(args, plan):
+  return not args.buffered and len(plan) == 1 and isinstance(plan[0], LinePass)
+
+def read_blocks(args):
+  if args.path != '-':
+    f = open(args.path, 'rb')
+  elif hasattr(sys.stdin, 'buffer'):
+    f = sys.stdin.buffer
+  else:
+    # already decoded, e.g. a StringIO
+    while block := sys.stdin.read(STREAM_BLOCK):
+      yield block
+    return
+  import codecs
+  encoding = 'utf-8' if args.path != '-' else sys.stdin.encoding
+  decoder = codecs.getincrementaldecoder(encoding)('strict' if args.path != '-' else sys.stdin.errors)
+  try:
+    while data := f.read1(STREAM_BLOCK):
+      yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+  finally:
+    if args.path != '-':
+      f.close()
+
+def read_lines(args):
+  return split_blocks(read_blocks(args))
+
+def whole_lines(blocks):
+  # the blocks cut again after their last \n, so each holds whole lines, the last may have no ending
+  carry = ''
+  for block in blocks:
+    block = carry + block
+    # only cut after \n so a \r\n pair is never split across blocks
+    end = block.rfind('\n') + 1
+    carry = block[end:]
+    if end:
+      yield block[:end]
+  if carry:
+    yield carry
+
+def split_blocks(blocks):
+  for block in whole_lines(blocks):
+    yield from block.splitlines()
+
+class LineSource:
+  # the lines of a stream of text blocks, what hasn't been taken yet can also be had as whole
+  # blocks of lines joined by the line ending
+  def __init__(self, blocks):
+    self.blocks = whole_lines(blocks)
+    self.lines = iter(())
+
+  def __iter__(self):
+    for block in self.blocks:
+      self.lines = iter(block.splitlines())
+      yield from self.lines
+
+  def rest(self, ending):
+    if lines := list(self.lines):
+      yield ending.join(lines)
+    for block in self.blocks:
+      yield from line_pieces(block, 0, len(block), ending)
+
+  def candidates(self, ending, literals):
+    # (lines, True) for runs of lines that hold one of the literals, the lines in between that
+    # hold none come as (piece, False), whole lines joined by the line ending
+    for block in self.blocks:
+      yield from find_candidates(block, ending, literals)
+
+def line_pieces(text, start, end, ending):
+  # in pieces of whole lines, a batch of them is joined again on the way out
+  while start < end:
+    cut = text.find('\n', start + STREAM_PIECE, end) + 1 or end
+    yield ending.join(text[start:cut].splitlines())
+    start = cut
+
+def find_candidates(text, ending, literals):
+  folds = any(fold for literal, fold in literals)
+  if folds and not text.isascii():
+    # lower() can change where other characters are, every line is a candidate then
+    yield text.splitlines(), True
+    return
+  folded = text.lower() if folds else text
+  # looking for the next literal costs more than a regex when most lines have one, which the
+  # start of the text tells
+  hits = sum((folded if fold else text).count(literal, 0, PREFILTER_SAMPLE) for literal, fold in literals)
+  if hits * PREFILTER_SPARSE > text.count('\n', 0, PREFILTER_SAMPLE):
+    yield text.splitlines(), True
+    return
+  finds = [(folded if fold else text).find for literal, fold in literals]
+  hits = [find(literal) for find, (literal, fold) in zip(finds, literals)]
+  start, size = 0, len(text)
+  lines = []
+  while start < size:
+    hit = min((hit for hit in hits if hit >= 0), default=size)
+    begin = text.rfind('\n', start, hit) + 1 or start if hit < size else size
+    if begin > start:
+      if lines:
+        yield lines, True
+        lines = []
+      yield from ((piece, False) for piece in line_pieces(text, start, begin, ending))
+    if hit == size:
+      break
+    start = text.find('\n', hit) + 1 or size
+    lines += text[begin:start].splitlines()
+    hits = [hit if hit >= start or hit < 0 else find(literal, start)
+      for hit, find, (literal, fold) in zip(hits, finds, literals)]
+  if lines:
+    yield lines, True
+
+def drop_last_empty(lines):
+  held = False
+  for line in lines:
+    if held:
+      yield ''
+    held = not line
+    if line:
+      yield line
+
+def write_lines(args, lines, out=None):
+  out = out or sys.stdout
+  for block in join_blocks(args, lines):
+    out.write(block)
+
+def join_blocks(args, lines):
+  batch = []
+  sep = ''
+  for line in lines:
+    batch.append(line)
+    if len(batch) >= STREAM_BATCH:
+      yield sep + args.ending.join(batch)
+      batch = []
+      sep = args.ending
+  if batch:
+    yield sep + args.ending.join(batch)
+    sep = args.ending
+  if sep and args.eof:
+    yield args.ending
+
+def is_windowed(args, plan):
+  if not args.window or args.buffered:
+    return False
+  if error := engines().window_error(args, plan):
+    raise PedError(error, PedErrorTypes.PED_OTHER_ERROR)
+  return True
+
+def is_parallel(args, plan):
+  if not args.parallel or args.buffered or not plan:
+    return False
+  if error := engines().parallel_error(args, plan):
+    raise PedError(error, PedErrorTypes.PED_OTHER_ERROR)
+  if args.path == '-':
+    raise PedError('Error: --parallel needs a file, stdin can not be split into chunks', PedErrorTypes.PED_OTHER_ERROR)
+  return True
+
+def edit_chunk_worker(start, end, first, last):
+  import copy
+  args, plan = worker_plan
+  with open(args.path, 'rb') as f:
+    f.seek(start)
+    text = f.read(end - start).decode('utf-8')
+  # a prepend goes before the first line of the file and an append after the last
+  step = LinePass([cmd for cmd in plan[0].commands if (first or cmd.op != LINE_PREPEND)
+    and (last or cmd.op != LINE_APPEND)], plan[0].clean)
+  chunk_args = copy.copy(args)
+  chunk_args.eof = False
+  lines = iter_lines(args, text)
+  with TimeLimit(args, step):
+    if args.normalize and not args.eof and last:
+      blocks = list(join_blocks(chunk_args, step.run(args, drop_last_empty(lines))))
+    else:
+      blocks = list(join_blocks(chunk_args, step.run(args, lines, source=lines)))
+  return ''.join(blocks), bool(blocks)
+
+def is_mappable(args, plan):
+  # the bytes written must be what writing the str result would have produced
+  return (not args.buffered and not args.inplace and not args.normalize and not args.window
+    and os.linesep == '\n' and len(plan) == 1 and isinstance(plan[0], Command)
+    and plan[0].op in [FILE_SUB, FILE_REMOVE, FILE_ONLY])
+
+def edit_mapped(args, cmd, out):
+  import mmap
+  write = bytes_writer(out)
+  with open(args.path, 'rb') as f:
+    # empty files can't be mapped
+    if write is None or os.fstat(f.fileno()).st_size == 0:
+      return False
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      regex = bytes_regex(args, cmd, mm)
+      if regex is None:
+        return False
+      write_mapped(args, cmd, regex, mm, write)
+  return True
+
+def bytes_writer(out):
+  import codecs
+  if not hasattr(out, 'buffer'):
+    # the output is UTF-8 as a whole, but a block of it can end inside a character
+    decode = codecs.getincrementaldecoder('utf-8')().decode
+    return lambda data: out.write(decode(data))
+  if codecs.lookup(out.encoding).name != 'utf-8':
+    return None
+  out.flush()
+  return out.buffer.write
+
+def bytes_regex(args, cmd, mm):
+  # a bytes pattern only finds the same matches as the str pattern when the text is ASCII, or
+  # when the pattern can't match part of a multi-byte character and has no Unicode semantics
+  pattern = cmd.regex.pattern
+  flags = cmd.regex.flags & ~re.UNICODE
+  if not pattern.isascii() or (cmd.repl and re.search(r'\\([xuUN0]|[0-7]{3})', cmd.repl)):
+    return None
+  # text mode reading turns \r and \r\n into \n
+  if mm.find(b'\r') >= 0:
+    return None
+  ascii = all(mm[i:i + MAP_BLOCK].isascii() for i in range(0, len(mm), MAP_BLOCK))
+  if ascii:
+    # \s matches \x1c-\x1f in str patterns but not bytes patterns
+    if re.search(r'\\[sS]', pattern) and re.search(rb'[\x1c-\x1f]', mm):
+      return None
+  else:
+    unsafe = r'\.|\[\^|\\[WSDBxuUN0-9]|\(\?[a-zA-Z-]+[:)]' + ('' if flags & re.ASCII else r'|\\[wsdb]')
+    if (re.search(unsafe, pattern) or (flags & re.IGNORECASE and not flags & re.ASCII)
+        or min_width(pattern, flags) == 0):
+      return None
+    import codecs
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for i in range(0, len(mm), MAP_BLOCK):
+      decoder.decode(mm[i:i + MAP_BLOCK])
+    decoder.decode(b'', final=True)
+  try:
+    return compile_regex(pattern.encode('ascii'), flags)
+  except re.error:
+    return None
+
+@functools.lru_cache(maxsize=REGEX_CACHE)
+def parse_regex(pattern, flags):
+  # the checks below only read the tree, so they share one parse of each pattern
+  try:
+    from re import _parser as sre_parse, _constants as sre
+  except ImportError:
+    import sre_parse
+    import sre_constants as sre
+  return sre_parse.parse(pattern, flags), sre
+
+def min_width(pattern, flags):
+  return parse_regex(pattern, flags)[0].getwidth()[0]
+
+@functools.lru_cache(maxsize=REGEX_CACHE)
+def nested_repeat(pattern, flags):
+  # a repeat of something with a repeat in it that can match nothing, or of little else than
+  # another repeat, can split the same text between its repetitions in exponentially many ways,
+  # and re tries them all before a match fails, e.g. (a*b?)*, (a+)+, (\w+\s?)*, (a+|b)*
+  if ')' not in pattern or not any(c in pattern for c in '*+{'):
+    # only a group can be repeated without limit around another repeat
+    return False
+  tree, sre = parse_regex(pattern, flags)
+  repeats = [sre.MAX_REPEAT, sre.MIN_REPEAT]
+  subpattern = tree.__class__
+
+  def children(av):
+    for value in av if isinstance(av, (tuple, list)) else [av]:
+      if isinstance(value, subpattern):
+        yield value
+      elif isinstance(value, (tuple, list)):
+        yield from children(value)
+
+  def repeated(items):
+    # whether whatever the items have to match is all matched by a repeat
+    needed = [(op, av) for op, av in items if subpattern(tree.state, [(op, av)]).getwidth()[0]]
+    if len(needed) != 1:
+      return False
+    op, av = needed[0]
+    if op in repeats:
+      return av[1] > 1
+    if op == sre.SUBPATTERN:
+      return repeated(av[-1])
+    if op == sre.BRANCH:
+      return any(repeated(branch) for branch in av[1])
+    return False
+
+  def has_repeat(items):
+    return any((op in repeats and av[1] > 1) or any(has_repeat(child) for child in children(av)) for op, av in items)
+
+  def nested(items):
+    for op, av in items:
+      if op in repeats and av[1] == sre.MAXREPEAT:
+        low, high = av[2].getwidth()
+        if (high and not low and has_repeat(av[2])) or repeated(av[2]):
+          return True
+      if any(nested(child) for child in children(av)):
+        return True
+    return False
+
+  return nested(tree)
+
+@functools.lru_cache(maxsize=REGEX_CACHE)
+def required_literal(pattern, flags):
+  # the longest run of characters every match contains as (text, fold), lower cased when the
+  # pattern ignores case, which is only looked for in ASCII text, None when there's no such run
+  if len(pattern) < PREFILTER_MIN:
+    return None
+  tree, sre = parse_regex(pattern, flags)
+  fold = bool(tree.state.flags & re.IGNORECASE)
+  repeats = [sre.MAX_REPEAT, sre.MIN_REPEAT, getattr(sre, 'POSSESSIVE_REPEAT', None)]
+  runs = []
+
+  def scan(items):
+    run = []
+    for op, av in items:
+      if op == sre.LITERAL:
+        run.append(chr(av))
+        continue
+      runs.append(''.join(run))
+      run = []
+      if op == sre.SUBPATTERN and not av[1] and not av[2]:
+        scan(av[-1])
+      elif op in repeats and av[0] > 0:
+        scan(av[2])
+    runs.append(''.join(run))
+
+  scan(tree)
+  literal = max(runs, key=len)
+  if len(literal) < PREFILTER_MIN or (fold and not literal.isascii()):
+    return None
+  return (literal.lower() if fold else literal), fold
+
+def is_line_bounded(regex):
+  # true when neither a match nor a failed attempt can see past a \n, so running the regex on
+  # pieces of the text cut after a \n finds the same matches as running it on the whole text
+  tree, sre = parse_regex(regex.pattern, regex.flags)
+  flags = tree.state.flags
+  anchors = [sre.AT_BEGINNING_STRING, sre.AT_END_STRING]
+  if not flags & re.MULTILINE:
+    anchors += [sre.AT_BEGINNING, sre.AT_END]
+  categories = [sre.CATEGORY_DIGIT, sre.CATEGORY_WORD]
+  repeats = [sre.MAX_REPEAT, sre.MIN_REPEAT, getattr(sre, 'POSSESSIVE_REPEAT', None)]
+
+  def in_bounded(items):
+    for op, av in items:
+      if op == sre.LITERAL:
+        ok = av != 10
+      elif op == sre.RANGE:
+        ok = not av[0] <= 10 <= av[1]
+      elif op == sre.CATEGORY:
+        ok = av in categories
+      else:
+        ok = False
+      if not ok:
+        return False
+    return True
+
+  def bounded(items, dotall):
+    for op, av in items:
+      if op == sre.LITERAL:
+        ok = av != 10
+      elif op == sre.NOT_LITERAL:
+        ok = av == 10
+      elif op == sre.ANY:
+        ok = not dotall
+      elif op == sre.IN:
+        ok = in_bounded(av)
+      elif op == sre.CATEGORY:
+        ok = av in categories
+      elif op == sre.AT:
+        ok = av not in anchors
+      elif op == sre.GROUPREF:
+        ok = True
+      elif op == sre.SUBPATTERN:
+        ok = bounded(av[3], (dotall or av[1] & re.DOTALL) and not av[2] & re.DOTALL)
+      elif op == sre.BRANCH:
+        ok = all(bounded(branch, dotall) for branch in av[1])
+      elif op in repeats:
+        ok = bounded(av[2], dotall)
+      elif op == sre.ASSERT or op == sre.ASSERT_NOT:
+        ok = bounded(av[1], dotall)
+      elif op == getattr(sre, 'ATOMIC_GROUP', None):
+        ok = bounded(av, dotall)
+      elif op == sre.GROUPREF_EXISTS:
+        ok = bounded(av[1], dotall) and (av[2] is None or bounded(av[2], dotall))
+      else:
+        ok = False
+      if not ok:
+        return False
+    return True
+
+  # an empty match at the end of one piece would be found again at the start of the next
+  return tree.getwidth()[0] > 0 and bounded(tree.data, flags & re.DOTALL)
+
+def write_mapped(args, cmd, regex, mm, write):
+  only = cmd.op == FILE_ONLY
+  repl = None if only else cmd.repl.encode('utf-8')
+  expand = repl is not None and b'\\' in repl
+  if is_line_bounded(regex):
+    write_mapped_lines(args, regex, repl, mm, write)
+    return
+  parts = []
+  size = 0
+  pos = 0
+  with memoryview(mm) as view:
+    for n, match in enumerate(regex.finditer(mm), 1):
+      start, end = match.span()
+      if only:
+        parts.append(view[start:end])
+      else:
+        parts += [view[pos:start], match.expand(repl) if expand else repl]
+        size += start - pos
+      size += end - start
+      pos = end
+      if size >= STREAM_BLOCK:
+        write(b''.join(parts))
+        parts = []
+        size = 0
+      if n == args.maxsub and not only:
+        break
+    if parts:
+      write(b''.join(parts))
+    parts = None
+    if not only:
+      for i in range(pos, len(mm), MAP_BLOCK):
+        write(view[i:min(i + MAP_BLOCK, len(mm))])
+
+def write_mapped_lines(args, regex, repl, mm, write):
+  # let re do the work one piece of whole lines at a time
+  left = args.maxsub if args.maxsub > 0 else -1
+  pos = 0
+  while pos < len(mm):
+    end = mm.find(b'\n', pos + MAP_PIECE) + 1 or len(mm)
+    piece = mm[pos:end]
+    if repl is None:
+      write(b''.join([match[0] for match in regex.finditer(piece)]))
+    elif left:
+      piece, count = regex.subn(repl, piece, count=max(left, 0))
+      left -= count if left > 0 else 0
+      write(piece)
+    else:
+      write(piece)
+    pos = end
+
+def line_feed(args, cmd):
+  # per run (feed, finish) pair for a line-local command, feed takes a line and returns the
+  # line, None when it is dropped or a list of lines, finish returns the lines to add at the end
+  op = cmd.op
+  regex = cmd.regex
+  finish = lambda: []
+  feed = None
+  resplit = [op in [LINE_APPEND, LINE_PREPEND, LINE_INSERT] and '\n' in cmd.text]
+  if op == FILTER:
+    search = regex.search
+    feed = lambda line: line if search(line) else None
+  elif op == LINE_FILTER:
+    fullmatch = regex.fullmatch
+    feed = lambda line: line if fullmatch(line) else None
+  elif op == EXCLUDE:
+    search = regex.search
+    feed = lambda line: None if search(line) else line
+  elif op == LINE_EXCLUDE:
+    fullmatch = regex.fullmatch
+    feed = lambda line: None if fullmatch(line) else line
+  elif op == LINE_ONLY:
+    finditer = regex.finditer
+    def feed(line):
+      matches = [match[0] for match in finditer(line)]
+      return ''.join(matches) if matches else None
+  elif op == LINE_REMOVE:
+    sub = regex.sub
+    feed = lambda line: sub('', line)
+  elif op in [LINE_SUB, LINE_FIXED_SUB, LINE_MAP] or op in LINE_XFORMS:
+    feed = sub_feed(args, cmd, resplit)
+  elif op in [LINE_INSERT, LINE_PREPEND]:
+    feed, finish = insert_feed(args, cmd)
+  else:
+    finish = lambda: cmd.lines
+  if args.maxcount > 0 and op in ALL_FILTERS and op != LINE_REMOVE:
+    feed = keep_count(feed, args.maxcount)
+  if not args.eof and op in RESPLIT_OPS:
+    feed, finish = hold_empty(feed, finish, resplit)
+  return feed, finish
+
+def keep_count(feed, count):
+  # a filter that keeps count lines at most, after that it is done and drops every line
+  kept = 0
+  def limited(line):
+    nonlocal kept
+    if kept >= count:
+      return None
+    line = feed(line)
+    kept += line is not None
+    return line
+  limited.done = lambda: kept >= count
+  return limited
+
+def sub_feed(args, cmd, resplit):
+  sub = cmd.regex.sub
+  subn = cmd.regex.subn
+  repl = cmd.repl
+  ending = args.ending
+  splits = cmd.op not in LINE_XFORMS
+  # the case changing commands only apply -L together with -M
+  linesub = args.maxlinesub if splits or args.maxsub > 0 else 0
+  if args.maxsub <= 0:
+    def feed(line):
+      line = sub(repl, line, linesub)
+      if splits and '\n' in line:
+        resplit[0] = True
+        return (line + ending).splitlines()
+      return line
+    return feed
+  left = args.maxsub
+  def feed(line):
+    nonlocal left
+    if left <= 0:
+      return line
+    line, count = subn(repl, line, left if linesub == 0 else min(left, linesub))
+    left -= count
+    if splits and '\n' in line:
+      resplit[0] = True
+      return (line + ending).splitlines()
+    return line
+  # no line is changed once the substitutions are used up
+  feed.spent = lambda: left <= 0
+  return feed
+
+def insert_feed(args, cmd):
+  index = cmd.index
+  seen = 0
+  def feed(line):
+    nonlocal seen
+    seen += 1
+    return cmd.lines + [line] if seen - 1 == index else line
+  def finish():
+    return cmd.lines if index >= seen else []
+  feed.spent = lambda: seen > index
+  return feed, finish
+
+def hold_empty(feed, finish, resplit):
+  # re-splitting with --no-eof joins the lines without a final line ending, which drops a
+  # trailing empty line, so an empty line is held back until it's known whether it is last
+  held = False
+  def hold(lines):
+    nonlocal held
+    out = []
+    for line in lines:
+      if held:
+        out.append('')
+        held = False
+      if line:
+        out.append(line)
+      else:
+        held = True
+    return out
+  def held_feed(line):
+    line = feed(line) if feed else line
+    if line is None:
+      return None
+    return hold([line] if line.__class__ is str else line)
+  def held_finish():
+    lines = hold(finish())
+    if held and not resplit[0]:
+      lines.append('')
+    return lines
+  held_feed.holding = lambda: held
+  return held_feed, held_finish
+
+def push_lines(feeds, k, lines):
+  out = []
+  for line in lines:
+    for j in range(k, len(feeds)):
+      line = feeds[j](line)
+      if line is None:
+        break
+      if line.__class__ is list:
+        out += push_lines(feeds, j + 1, line)
+        break
+    else:
+      out.append(line)
+  return out
+
+class LinePass:
+  def __init__(self, commands, clean=True):
+    self.commands = commands
+    # no line break inside any line, so the lines can be handed on joined
+    self.clean = clean
+
+  def apply(self, args, data, wrap=None):
+    lines = iter_lines(args, data)
+    if self.clean and args.eof and args.ending in ['\n', '\r\n']:
+      source = lines if isinstance(lines, LineSource) else None
+      return ''.join(join_blocks(args, self.run(args, lines, wrap, source)))
+    return list(self.run(args, lines, wrap))
+
+  def run(self, args, lines, wrap=None, source=None):
+    # source, when the lines come out joined, lets the lines no command changes anymore be
+    # copied a block at a time
+    steps = [line_feed(args, cmd) for cmd in self.commands]
+    if wrap:
+      steps = [wrap(cmd, feed, finish) for cmd, (feed, finish) in zip(self.commands, steps)]
+    feeds = [feed for feed, finish in steps if feed]
+    done = [feed.done for feed in feeds if hasattr(feed, 'done')]
+    spent = [feed.spent for feed in feeds if hasattr(feed, 'spent')]
+    rest = []
+    skim = source and not wrap and self.prefilter(args)
+    if skim:
+      # only the lines with a literal go through the commands, the pieces of lines in between
+      # are handed on as they are or dropped
+      literals, drops = skim
+      runs = source.candidates(args.ending, literals)
+    else:
+      if done or (source and len(spent) == len(feeds)):
+        lines = self.until_limits(args, lines, done, spent if source and len(spent) == len(feeds) else None, source, rest)
+      runs, drops = [(lines, True)], False
+    for lines, candidates in runs:
+      if not candidates:
+        if not drops:
+          yield lines
+        continue
+      for line in lines:
+        for feed in feeds:
+          line = feed(line)
+          if line is None or line.__class__ is list:
+            break
+        else:
+          yield line
+          continue
+        if line is not None:
+          yield from push_lines(feeds, feeds.index(feed) + 1, line)
+    for blocks in rest:
+      yield from blocks
+    k = 0
+    for feed, finish in steps:
+      k += 1 if feed else 0
+      yield from push_lines(feeds, k, finish())
+
+  def changes(self, args, units):
+    # (old, new) for the input up to a \n at a time, with runs of lines nothing changed taken
+    # together, and then what the commands add at the end
+    steps = [line_feed(args, cmd) for cmd in self.commands]
+    feeds = [feed for feed, finish in steps if feed]
+    # a held back empty line belongs with the line that comes after it
+    holds = [feed.holding for feed in feeds if hasattr(feed, 'holding')]
+    ending = args.ending
+    same = []
+    old, new = [], []
+    for unit, line in units:
+      k = 0
+      for feed in feeds:
+        k += 1
+        line = feed(line)
+        if line is None or line.__class__ is list:
+          break
+      if line.__class__ is str:
+        line += ending
+        if line == unit and not old and unit[-1] == '\n':
+          same.append(unit)
+          if len(same) >= STREAM_BATCH:
+            text = ''.join(same)
+            yield text, text
+            same = []
+          continue
+        new.append(line)
+      elif line is not None:
+        new += [line + ending for line in push_lines(feeds, k, line)]
+      old.append(unit)
+      if unit[-1] == '\n' and not (holds and any(holding() for holding in holds)):
+        if same:
+          text = ''.join(same)
+          yield text, text
+          same = []
+        yield ''.join(old), ''.join(new)
+        old, new = [], []
+    if same:
+      text = ''.join(same)
+      yield text, text
+    k = 0
+    for feed, finish in steps:
+      k += 1 if feed else 0
+      new += [line + ending for line in push_lines(feeds, k, finish())]
+    if old or new:
+      yield ''.join(old), ''.join(new)
+
+  def prefilter(self, args):
+    # (literals, drops) when a line without any of the literals gets through the commands
+    # unchanged, or is dropped by a filter before anything could have changed it
+    if args.maxsub or args.maxcount:
+      return None
+    literals = []
+    for cmd in self.commands:
+      if cmd.op not in PREFILTER_OPS or not cmd.literal:
+        return None
+      literals.append(cmd.literal)
+      if cmd.op in [FILTER, LINE_FILTER, LINE_ONLY]:
+        return literals, True
+    # with --no-eof an empty line may be held back by the commands that re-split lines
+    if not args.eof and any(cmd.op in RESPLIT_OPS for cmd in self.commands):
+      return None
+    return literals, False
+
+  def until_limits(self, args, lines, done, spent, source, rest):
+    # stops taking lines once a filter has kept all it may, or once no command changes a line
+    # anymore and the rest can be handed on a block at a time
+    lines = iter(lines)
+    while not any(limit() for limit in done):
+      if spent is not None and all(limit() for limit in spent):
+        rest.append(source.rest(args.ending))
+        return
+      for line in lines:
+        yield line
+        break
+      else:
+        return
+
+class EditPass:
+  def __init__(self, edits, commands):
+    self.edits = edits
+    self.commands = commands
+
+  def apply(self, args, data, wrap=None):
+    # wrap, given a command and the edit, returns what makes the edit in its place
+    lines = self.edits == EDIT_LINES
+    joined = lines and self.joinable(args, data)
+    if joined:
+      table = PieceTable(TextLines(data))
+    else:
+      table = PieceTable(get_lines(args, data) if lines else get_string(args, data))
+    for cmd in self.commands:
+      (wrap(cmd, self.edit) if wrap else self.edit)(table, cmd, lines)
+    if joined:
+      text = args.ending.join(p if isinstance(p, str) else args.ending.join(p) for p in table.pieces())
+      return text + args.ending if len(table) else text
+    return table.lines() if lines else table.text()
+
+  def edit(self, table, cmd, lines):
+    # negative positions count from the end, positions and counts are clamped to the data
+    size = len(table)
+    start = min(cmd.index if cmd.index >= 0 else max(size + cmd.index, 0), size)
+    if cmd.op in [LINE_INSERT, FILE_INSERT]:
+      table.insert(start, [cmd.text] if lines else cmd.text)
+      return
+    table.delete(start, min(max(cmd.count, 0), size - start))
+    if cmd.op == LINE_REPLACE:
+      table.insert(start, cmd.text.splitlines())
+    elif cmd.op == FILE_REPLACE:
+      table.insert(start, cmd.text)
+
+  def joinable(self, args, data):
+    # the lines of a str can be used in place when \n is the only line break before and after
+    if not isinstance(data, str) or args.ending != '\n' or not args.eof:
+      return False
+    if any(cmd.op == LINE_INSERT and not is_line_safe(cmd.text) for cmd in self.commands):
+      return False
+    return not any(c in data for c in LINE_BREAKS)
+
+class TextLines:
+  # the lines of a str without splitting it, the line breaks in each block are only counted
+  # the first time a line is looked up and a slice is the text of a run of lines
+  def __init__(self, text):
+    self.text = text
+    self.size = text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+    self.counts = None
+
+  def __len__(self):
+    return self.size
+
+  def __getitem__(self, lines):
+    return self.text[self.offset(lines.start):self.offset(lines.stop) - 1]
+
+  def offset(self, line):
+    text = self.text
+    if line <= 0:
+      return 0
+    if line >= self.size:
+      return len(text) + (0 if text.endswith('\n') else 1)
+    if self.counts is None:
+      import itertools
+      blocks = range(0, len(text), INDEX_BLOCK)
+      self.counts = [0, *itertools.accumulate(text.count('\n', i, i + INDEX_BLOCK) for i in blocks)]
+    import bisect
+    block = bisect.bisect_left(self.counts, line) - 1
+    pos = block * INDEX_BLOCK
+    for _ in range(line - self.counts[block]):
+      pos = text.find('\n', pos) + 1
+    return pos
+
+class Piece:
+  __slots__ = ['left', 'right', 'priority', 'size', 'data', 'start', 'length']
+
+  def __init__(self, data, start, length, priority):
+    self.left = self.right = None
+    self.priority = priority
+    self.size = self.length = length
+    self.data = data
+    self.start = start
+
+class PieceTable:
+  # a list or str edited by position, the pieces of the original and the inserted data are kept
+  # in a treap ordered by position so an edit splits and joins O(log n) pieces, the result is
+  # only built once at the end
+  def __init__(self, data):
+    # the priorities only have to look random, importing random would take longer than most edits
+    self.seed = len(data)
+    self.root = self.piece(data) if data else None
+
+  def __len__(self):
+    return self.root.size if self.root else 0
+
+  def piece(self, data, start=0, length=None):
+    return Piece(data, start, len(data) - start if length is None else length, self.priority())
+
+  def priority(self):
+    # a 64 bit linear congruential generator, the high bits are the random ones
+    self.seed = (self.seed * 6364136223846793005 + 1442695040888963407) & 0xffffffffffffffff
+    return self.seed >> 16
+
+  def insert(self, index, data):
+    if data:
+      left, right = self.split(self.root, index)
+      self.root = self.merge(self.merge(left, self.piece(data)), right)
+
+  def delete(self, index, count):
+    if count > 0:
+      left, right = self.split(self.root, index)
+      self.root = self.merge(left, self.split(right, count)[1])
+
+  def update(self, node):
+    node.size = node.length + (node.left.size if node.left else 0) + (node.right.size if node.right else 0)
+    return node
+
+  def merge(self, left, right):
+    if not left or not right:
+      return left or right
+    if left.priority > right.priority:
+      left.right = self.merge(left.right, right)
+      return self.update(left)
+    right.left = self.merge(left, right.left)
+    return self.update(right)
+
+  def split(self, node, index):
+    # the first index items and the rest
+    if not node:
+      return None, None
+    before = node.left.size if node.left else 0
+    if index <= before:
+      left, node.left = self.split(node.left, index)
+      return left, self.update(node)
+    if index >= before + node.length:
+      node.right, right = self.split(node.right, index - before - node.length)
+      return self.update(node), right
+    index -= before
+    tail = self.piece(node.data, node.start + index, node.length - index)
+    node.length = index
+    right, node.right = node.right, None
+    return self.update(node), self.merge(tail, right)
+
+  def pieces(self):
+    stack = []
+    node = self.root
+    while stack or node:
+      while node:
+        stack.append(node)
+        node = node.left
+      node = stack.pop()
+      yield node.data[node.start:node.start + node.length]
+      node = node.right
+
+  def lines(self):
+    lines = []
+    for piece in self.pieces():
+      lines += piece
+    return lines
+
+  def text(self):
+    return ''.join(self.pieces())
+
+class Command:
+  def __init__(self, args, item):
+    self.item = item
+    self.op = op = item[0]
+    self.sep = sep = item[1]
+    self.regex = None
+    self.repl = None
+    self.index = 0
+    self.count = 0
+    self.text = None
+    e = None
+    if op in [LINE_SUB, LINE_FIXED_SUB, FILE_SUB]:
+      e, self.repl = param_str_str(item, sep)
+    elif op in [LINE_REMOVE, FILE_REMOVE]:
+      e, self.repl = param_str(item, sep), ''
+    elif op in ALL_FILTERS or op == FILE_ONLY:
+      e = param_str(item, sep)
+    elif op in LINE_XFORMS or op in FILE_XFORMS:
+      e, self.repl = param_str(item, sep), functools.partial(xform, op=op)
+    elif op in [LINE_APPEND, LINE_PREPEND, FILE_APPEND, FILE_PREPEND]:
+      self.text = param_str(item, sep)
+    elif op in [LINE_INSERT, FILE_INSERT]:
+      self.index, self.text = param_num_str(item, sep)
+    elif op in [LINE_REPLACE, FILE_REPLACE]:
+      self.index, self.count, self.text = param_num_num_str(item, sep)
+    elif op in [LINE_DELETE, FILE_DELETE]:
+      self.index, self.count = param_num_num(item, sep)
+    elif op in [LINE_MAP, FILE_MAP]:
+      # the only parameter, so a path may contain the delimiter
+      self.text = item[2:-1] if item.endswith(sep) and len(item) > 2 else item[2:]
+      maps = engines()
+      self.table = maps.load_map(self.text)
+      self.regex = maps.map_regex(self.table, args.insensitive | args.ascii)
+      self.repl = maps.map_repl(self.table, self.regex)
+    else:
+      raise ValueError(f'Unknown command: "{item}" from the "{item}" command')
+    # the keys of a map are fixed strings too
+    self.fixed = op in [LINE_MAP, FILE_MAP]
+    if e is not None:
+      self.fixed = args.fixed or op == LINE_FIXED_SUB
+      e = re.escape(e) if self.fixed else e
+      self.regex = compile_regex(e, args.insensitive | args.multiline | args.ascii | args.dotall)
+      if isinstance(self.repl, str) and '\\' in self.repl:
+        # a bad template is reported like re.sub() does, even when no line gets to the regex
+        self.regex.sub(self.repl, '')
+    self.lines = None
+    if op in [LINE_APPEND, LINE_PREPEND, LINE_INSERT]:
+      self.lines = (self.text + args.ending).splitlines() if '\n' in self.text else [self.text]
+    safe = True
+    if op in [LINE_SUB, LINE_FIXED_SUB]:
+      safe = is_line_safe(self.repl, template=True)
+    elif op == LINE_MAP:
+      safe = all(is_line_safe(text) for text in self.table.values())
+    elif op in [LINE_APPEND, LINE_PREPEND, LINE_INSERT]:
+      safe = is_line_safe(self.text)
+    self.taints = not safe
+    # with another line ending -n joins the lines with it before they are split again
+    breaks = args.ending in ['\n', '\r\n']
+    if op in RESPLIT_OPS:
+      self.line_local = safe and breaks and self.index >= 0
+    else:
+      self.line_local = (op in ALL_FILTERS or op in LINE_XFORMS) and breaks
+    # an inserted line with a \n re-splits all the lines, so it can't be a piece
+    if op in [LINE_REPLACE, LINE_DELETE] or (op == LINE_INSERT and '\n' not in self.text):
+      self.edits = EDIT_LINES
+    elif op in [FILE_INSERT, FILE_REPLACE, FILE_DELETE]:
+      self.edits = EDIT_CHARS
+    else:
+      self.edits = None
+
+  @functools.cached_property
+  def backtracks(self):
+    # the pattern is only parsed for this and the literal when a run asks for them
+    return self.regex is not None and not self.fixed and nested_repeat(self.regex.pattern, self.regex.flags)
+
+  @functools.cached_property
+  def literal(self):
+    if self.regex is None or self.op in [LINE_MAP, FILE_MAP]:
+      return None
+    return required_literal(self.regex.pattern, self.regex.flags)
+
+  def apply(self, args, data):
+    return run_command(args, data, self)
+
+  def __str__(self):
+    if self.op in [LINE_MAP, FILE_MAP]:
+      return f'{self.op} {self.text!r} ({len(self.table)} pairs{", re.IGNORECASE" if self.regex.flags & re.IGNORECASE else ""})'
+    desc = f'{self.op}'
+    if self.regex:
+      desc += f' {self.regex.pattern!r}'
+      if self.regex.flags & ~re.UNICODE:
+        desc += f' ({str(re.RegexFlag(self.regex.flags & ~re.UNICODE))})'
+      if self.repl is not None:
+        desc += f' -> {self.repl!r}' if isinstance(self.repl, str) else ' -> ' + XFORM_NAMES[self.op.lower()]
+    if self.op in [LINE_INSERT, FILE_INSERT, LINE_REPLACE, FILE_REPLACE, LINE_DELETE, FILE_DELETE]:
+      desc += f' at {self.index}'
+    if self.op in [LINE_REPLACE, FILE_REPLACE, LINE_DELETE, FILE_DELETE]:
+      desc += f' count {self.count}'
+    if self.text is not None:
+      desc += f' {self.text!r}'
+    return desc
+
+def engines():
+  # the parts of ped only some runs need are in ped_engines.py, imported on first use
+  import ped_engines
+  return ped_engines
+
+def get_file_contents(path):
+  with open(path, encoding="utf-8") as f:
+    return f.read()
+
+class PedErrorTypes(IntEnum):
+  PED_IO_ERROR = 1
+  PED_RE_ERROR = 2
+  PED_OTHER_ERROR = 3
+  PED_TIMEOUT_ERROR = 4
+
+class PedError(Exception):
+  def __init__(self, message, type):
+    super().__init__(message)
+    self.msg = message
+    self.type = type
+
+  def __reduce__(self):
+    # raised in a worker process it's pickled back to the parent
+    return PedError, (self.msg, self.type)
+
+def use_color(args, stream=sys.stdout):
+    supported_platform = (sys.platform != 'win32' or 'ANSICON' in os.environ)
+    is_a_tty = hasattr(stream, 'isatty') and sys.stdout.isatty()
+    return args.color == True or (supported_platform and is_a_tty and args.color != False)
+
+def ped_error(e):
+  if isinstance(e, PedError):
+    return e
+  elif isinstance(e, re.error):
+    return PedError(f'''Error: regular expression invalid - '''
+      f'''{e.msg if hasattr(e, "msg") else "???"}'''
+      f'''{f' : "{e.pattern}"' if hasattr(e, 'pattern') else ''}''', PedErrorTypes.PED_RE_ERROR)
+  elif isinstance(e, FileNotFoundError):
+    return PedError(f'Error: file not found' + (f' - "{e.filename}"' if hasattr(e, 'filename') else ''), PedErrorTypes.PED_IO_ERROR)
+  elif isinstance(e, PermissionError):
+    return PedError(f'Error: permissions error', PedErrorTypes.PED_IO_ERROR)
+  elif isinstance(e, UnicodeDecodeError):
+    return PedError(f'Error: file is not valid {e.encoding} - {e.reason}', PedErrorTypes.PED_IO_ERROR)
+  elif isinstance(e, OSError):
+    fn = f'''{"" if e.filename is None else f' "{e.filename}" '}'''
+    type = PedErrorTypes.PED_OTHER_ERROR if e.filename is None else PedErrorTypes.PED_IO_ERROR
+    return PedError(f'Error: [{e.errno}] {e.strerror}{fn}', type)
+  else:
+    if hasattr(e, 'strerror'):
+      msg = f'- {e.strerror}'
+    elif hasattr(e, 'msg'):
+      msg = f'- {e.msg}'
+    elif hasattr(e, 'message'):
+      msg = f'- {e.message}'
+    else:
+      msg = 'unknown'
+    return PedError(f'Error: unexpected error - {msg}', PedErrorTypes.PED_OTHER_ERROR)
+
+def catching_main(argv):
+  try:
+    main(argv)
+  except PedError:
+    raise
+  except Exception as e:
+    raise ped_error(e) from e
@@ -0,0 +1,1014 @@
+# the parts of ped only some runs need: help, reports, batches, windows, chunks, stats, the cache
+# and maps, ped imports them on first use
+
+import functools
+import os
+import re
+import sys
+
+from ped import (Command, DIFF_CONTEXT, EDIT_LINES, EditPass, FILE_APPEND, FILE_MAP, FILE_ONLY, FILE_PREPEND,
+  InPlaceWriter, LINE_APPEND, LINE_FIXED_SUB, LINE_INSERT, LINE_MAP, LINE_PREPEND, LINE_SUB, LinePass,
+  PARALLEL_CHUNK, PedError, PedErrorTypes, REGEX_CACHE, STREAM_BLOCK, TEXT_OPS, TimeLimit, WINDOW_OPS,
+  compile_regex, edit, edit_chunk_worker, edit_file_worker, edit_text, get_file_contents, get_string,
+  init_worker, is_mappable, is_streamable, iter_lines, join_blocks, parse_regex, ped_error, read_blocks,
+  read_lines, split_blocks, whole_lines)
+
+EPILOG = '''
+<mark-over>Commands:
+
+    s - regexp substitution within lines
+    S - regexp substitution across lines, regexp match can span lines† 
+    f - fixed string substitution within lines (shorthand for `s` & -F)
+    g - [grep] regexp filter lines, keep only lines with one more more matches
+    G - regexp filter lines, keep only lines that completely match
+    x - [exclude] regexp filter lines, keep only lines WITHOUT one more more matches
+    X - regexp filter lines, keep only lines that DO NOT completely match
+    o - [only] regexp filter lines keeping only the matching parts of lines
+    O - Only keep part(s) of the file that matches the regexp†
+    r - regexp filter lines removing only the matching parts of lines
+    R - Only remove part(s) of the file that matches the regexp†
+    l - transform match to lower case by line
+    L - transform match to lower case across lines†
+    u - transform match to upper case by line
+    U - transform match to upper case across lines†
+    t - transform match to title case by line
+    T - transform match to title case across lines¹
+    c - transform match to a capitalized sentence by line
+    C - transform match to a capitalized sentence across lines†
+    a - append lines
+    A - append characters
+    p - prepend lines
+    P - prepend characters
+    i - insert by line number 'i/<pos>/str/' 1: after the first line, -1: before the last line
+    I - insert at character position  'I/<pos>/str/' 1: after the first char, -1: before the last char
+    y - replace lines 'y/<pos>/<count>/str/'
+    Y - replace characters 'y/<pos>/<count>/str/'
+    d - delete lines by line number and count
+    D - delete characters by position and count
+    m - replace fixed strings within lines using a map file 'm:<file>'
+    M - replace fixed strings across lines using a map file 'M:<file>'
+
+Commands are processed in the order they appear, usually
+consisting of a one character operation code and parameters
+delimited by a slash or other punctuation, for example:
+
+  s/this/that/
+
+would invoke the `s` for substitution operation which would replace
+all occurrences of `this` with `that`. The first parameter is a
+regular expression and the second is the replacement string. Though
+similar to the venerable sed command, the regular expressions are
+python compatible, see: https://tinyurl.com/py3-re-syntax . 
+
+Delimiters can be any punctuation character so no meta-escaping is needed,
+for example to change all slashes to underscores you could use:
+
+  s:/:_:
+
+Also, the trailing delimiter is optional, the following is identical to 
+the preceding:
+
+  s:/:_
+
+Use of single quotes is recommended to avoid shell pattern and meta-character  
+issues:
+
+  $> ped -f input 's:$:_'
+
+The substitution command with a uppercase `S` can use patterns that span lines, 
+so if you wanted to change Fred Flintstone to Barney Rubble even if Fred was 
+at the end of one line and Flintstone was at the beginning of the next you might
+use:
+
+  $> ped -f story.txt 'S/Fred(\s+)Flintstone/Barney\\1Rubble'
+
+Explanations: \\s matches any white space character, \\s+ matches one or more
+whitespace, e.g. a space at the end of the line AND the line ending character(s)
+AND any indentation on the next line. Using \\1 in the replacement preserves whatever
+whitespace existed between Fred and Flintstone.
+
+The fixed `f` command is shorthand for `s` with the --fixed or -F option. The pattern
+is treated as a literal string, not a regular expression. All of these examples are
+equivalent:
+
+  $> ped -f story.txt 'f/./!/'
+  $> ped -f story.txt --fixed 's/./!/'
+  $> ped -f story.txt 's/\\./!/'
+
+Map files
+
+`m` and `M` replace many fixed strings in a single pass. The map file has one old and new string
+pair per line separated by a tab, or is a JSON file (named *.json) with an object of old to new
+strings. Where several old strings match at the same position the longest one is replaced. The
+--map option is shorthand for a `m` command after all the other commands.
+
+  $> ped -f app.py --map renames.tsv
+
+Server mode
+
+With --serve ped reads JSON requests from stdin, one per line, and writes one JSON response line
+for each to stdout, so an editor can keep a single process running. A request is an object with
+"commands", optional "args" (options as they would be given on the command line), and either the
+"text" to edit or a "path" (or a list of "paths"). Any "id" is copied to the response. A response
+has the "output" and whether the text "changed" (any of the files for "paths"), or an "error"
+with its "type" and exit "code". The "output" for "-h" is the help. Compiled patterns are kept
+between requests.
+
+  {"id": 1, "args": ["-i"], "commands": ["s/fred/barney/"], "text": "Fred\\n"}
+  {"id": 1, "output": "barney\\n", "changed": true}
+
+With --serve --cache the text after the commands of a request, and after all but its last command,
+is kept in memory, so a request for the same text and options that starts with the same commands
+only runs the commands after them, as when a chain of commands is typed in an editor. With
+--cache-dir the texts are also kept on disk, between runs as well. The response then has the
+"cache" figures: its "hits" and "misses", the number of commands the request "reused", and the
+"entries" and "bytes" kept in memory.
+
+Edit lists
+
+With --edits json ped writes a JSON line with the changes that turn the input into the edited text
+instead of the text itself, with -e the file is still edited. Each edit replaces "length" characters
+at "offset" with "text", the same range is also given as a 0 based "line" and "column" through
+"end_line" and "end_column", where lines end at \\n. --diff writes a unified diff instead, or nothing
+when there is no change. Lines edited by line commands (`s`, `g`, `a`, ...) are tracked as they are
+streamed, other edits are compared with the input afterwards.
+
+  $> ped -f app.py --edits json 's/fred/barney/'
+  {"path": "app.py", "changed": true, "edits": [{"offset": 4, "length": 4, "line": 0, "column": 4,
+    "end_line": 0, "end_column": 8, "text": "barney"}]}
+
+Filtering
+
+The `g`, `G`, `x`, `X`, `o` filter text line by line:
+
+  `g` - keep only lines that have a match anywhere on the line (like egrep)
+  `G` - keep only lines that completely match (excluding the line endings \\n and/or \\r) (like egrep -x)
+  `x` - keep only lines that DON'T have a match anywhere on the line (like egrep -v)
+  `X` - keep only lines that DON'T completely match (excluding the line endings \\n and/or \\r) (like egrep -v -x)
+  `o` - keep only the part(s) of lines that match, lines with no match are eliminated. (like egrep -o²)
+
+Removing matches 
+
+`r` will remove matches within a line, `R` will remove matches even if patterns span lines. These 
+commands are shorthand for for `s` and `S` with an empty replacement string.
+
+Case changing commands
+
+`l`, `L`, `u`, `U`, `t`, `T`, `c`, `C` replace matches with a lowercase, uppercase, title case 
+and capitalized sentence transformation of the matched text. The upper case versions 
+can match text across lines. Consult official python documentation for the technical 
+specification for each of these operations. See: https://docs.python.org/3/library/stdtypes.html#string-methods
+
+  $> ped -f story.txt -i 'U/fred\s+flintstone/'
+
+Appending & Prepending
+
+`a`, `p` are used to append and prepend a line³ based on the POSIX definition⁴ of lines.
+`A`, `P` are used to append and prepend characters to the input without regard to lines
+
+  $> ped -f shopping-list.txt 'a/eggs/'
+
+Line number operations
+
+`i`, `y`, `d` are used to insert, replace and delete lines by line number, negative values index from 
+the last line up. 0 positions before the first line, 1 positions after the first line, -1 positions
+before the last line. For the case of replace and delete the number of lines are specified with a second 
+numeric parameter. Replace `y` takes a third parameter of text to use for the replacement as literal text
+without any escaping supported or required. positions and/or counts are clamped to the range of data.
+
+  $> ped -f shopping-list.txt 'i/0/avocados/'   # same as prepend
+  $> ped -f shopping-list.txt 'i/1/eggs/'       # eggs are inserted as the second line
+  $> ped -f shopping-list.txt 'y/2/3/eggs'      # eggs replace the 3rd, 4th and 5th items on the list
+  $> ped -f shopping-list.txt 'y/-2/2/eggs'     # eggs replace the last two items on the list
+  $> ped -f shopping-list.txt 'd/5/1'           # delete 6th line
+  $> ped -f shopping-list.txt 'd/-2/2'          # delete last two lines
+
+¹ you will often want to use the --dotall option so that a dot `.` will match any
+character including line separators like \\r and \\n.
+
+² there is a subtle difference, egrep -o will create multiple lines of output for multiple matches on
+the same line
+
+³ embedded line termination characters will effectively append multiple lines
+
+⁴ POSIX defines a line as including a line ending character so a empty input (file) is considered to have zero lines 
+'''.strip()
+
+def edit_report(args, plan, out):
+  # a streamed line pass keeps track of what it changes line by line, any other edit is compared
+  # with the input once it's done
+  if is_streamable(args, plan) and not args.inplace and not (args.normalize and not args.eof):
+    changes = line_changes(drop_last_ending(args, plan[0].changes(args, raw_lines(read_blocks(args)))))
+    with TimeLimit(args, plan[0]):
+      return write_diff(args, changes, out) if args.report == 'diff' else write_edits(args, changes, out)
+  raw, contents = read_raw(args)
+  output = edit_text(args, plan, contents)
+  if args.inplace:
+    with InPlaceWriter(args) as writer:
+      writer.write(output)
+  changes = diff_changes(raw, output)
+  return write_diff(args, changes, out) if args.report == 'diff' else write_edits(args, changes, out)
+
+def read_raw(args):
+  # the input as it is, which positions in the edits refer to, and as read_contents has it, with
+  # the line endings of a file translated
+  if args.path == '-':
+    contents = sys.stdin.read()
+    return contents, contents
+  with open(args.path, encoding='utf-8', newline='') as f:
+    raw = f.read()
+  return raw, raw.replace('\r\n', '\n').replace('\r', '\n')
+
+def raw_lines(blocks):
+  # each line with and without its line ending, the way a str splits them
+  for block in whole_lines(blocks):
+    yield from zip(block.splitlines(keepends=True), block.splitlines())
+
+def drop_last_ending(args, changes):
+  # with --no-eof the last line written has no line ending, only removed lines can come after it
+  held = []
+  for old, new in changes:
+    if new:
+      yield from held
+      held = []
+    held.append((old, new))
+  if held and held[0][1] and not args.eof:
+    held[0] = (held[0][0], held[0][1][:-len(args.ending)])
+  yield from (pair for pair in held if pair != ('', ''))
+
+def diff_changes(old, new):
+  import difflib
+  a, b = diff_lines(old), diff_lines(new)
+  for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+    if op == 'equal':
+      text = ''.join(a[i1:i2])
+      yield text, text
+    else:
+      yield ''.join(a[i1:i2]), ''.join(b[j1:j2])
+
+def line_changes(changes):
+  # several lines changed together are matched up line by line, like a buffered edit has them
+  for old, new in changes:
+    if old != new and (len(diff_lines(old)) > 1 or len(diff_lines(new)) > 1):
+      yield from diff_changes(old, new)
+    else:
+      yield old, new
+
+def diff_lines(text):
+  # lines as a diff has them, ending with \n only
+  lines = text.split('\n')
+  return [line + '\n' for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+
+def write_edits(args, changes, out):
+  # each changed line is trimmed of what its old and new text have in common, edits that then
+  # touch are merged
+  import json
+  edits = []
+  pos = (0, 0, 0)
+  for a, b in changes:
+    if a != b:
+      edit = text_edit(pos, a, b)
+      last = edits[-1] if edits else None
+      if last and last['offset'] + last['length'] == edit['offset']:
+        last.update(length=last['length'] + edit['length'], end_line=edit['end_line'],
+          end_column=edit['end_column'], text=last['text'] + edit['text'])
+      else:
+        edits.append(edit)
+    pos = advance(pos, a)
+  out.write(json.dumps({'path': args.path, 'changed': bool(edits), 'edits': edits}) + '\n')
+  return bool(edits)
+
+def text_edit(start, old, new):
+  prefix = len(os.path.commonprefix([old, new]))
+  suffix = len(os.path.commonprefix([old[prefix:][::-1], new[prefix:][::-1]]))
+  begin = advance(start, old[:prefix])
+  end = advance(begin, old[prefix:len(old) - suffix])
+  return {'offset': begin[0], 'length': end[0] - begin[0], 'line': begin[1], 'column': begin[2],
+    'end_line': end[1], 'end_column': end[2], 'text': new[prefix:len(new) - suffix]}
+
+def advance(pos, text):
+  # (offset, line, column) after the text, lines end at a \n
+  offset, line, column = pos
+  breaks = text.count('\n')
+  return offset + len(text), line + breaks, len(text) - text.rfind('\n') - 1 if breaks else column + len(text)
+
+def write_diff(args, changes, out):
+  # like diff -u, with DIFF_CONTEXT lines of context around each change
+  import collections
+  before = collections.deque(maxlen=DIFF_CONTEXT)
+  hunk = None
+  old = new = 0
+  changed = False
+  for a, b in changes:
+    if a == b:
+      lines = diff_lines(a)
+      if hunk is None:
+        before.extend(lines)
+      elif hunk.context(lines) > 2 * DIFF_CONTEXT:
+        before.extend(hunk.write(out))
+        hunk = None
+      old, new = old + len(lines), new + len(lines)
+      continue
+    if not changed:
+      out.write(f'--- {args.path}\n+++ {args.path}\n')
+      changed = True
+    if hunk is None:
+      hunk = DiffHunk(old - len(before), new - len(before), before)
+      before.clear()
+    removed, added = diff_lines(a), diff_lines(b)
+    hunk.change(removed, added)
+    old, new = old + len(removed), new + len(added)
+  if hunk is not None:
+    hunk.write(out)
+  return changed
+
+class DiffHunk:
+  # the removed lines of a run of changes come before the added ones
+  def __init__(self, old, new, context):
+    self.old = old
+    self.new = new
+    self.lines = [' ' + line for line in context]
+    self.counts = [len(self.lines), len(self.lines)]
+    self.removed, self.added, self.gap = [], [], []
+
+  def change(self, removed, added):
+    if self.gap:
+      self.flush(self.gap)
+    self.removed += removed
+    self.added += added
+
+  def context(self, lines):
+    self.gap += lines
+    return len(self.gap)
+
+  def flush(self, context):
+    self.lines += ['-' + line for line in self.removed] + ['+' + line for line in self.added]
+    self.lines += [' ' + line for line in context]
+    self.counts[0] += len(self.removed) + len(context)
+    self.counts[1] += len(self.added) + len(context)
+    self.removed, self.added, self.gap = [], [], []
+
+  def write(self, out):
+    # returns the context lines that are left over
+    gap = self.gap
+    self.flush(gap[:DIFF_CONTEXT])
+    # an empty range starts at the line before it
+    old, new = [f'{start + (count > 0)}{"" if count == 1 else f",{count}"}'
+      for start, count in zip([self.old, self.new], self.counts)]
+    out.write(f'@@ -{old} +{new} @@\n')
+    for line in self.lines:
+      out.write(line if line.endswith('\n') else line + '\n\\ No newline at end of file\n')
+    return gap[DIFF_CONTEXT:]
+
+class PrefixCache:
+  # the text after a chain of commands, keyed by a hash of the input, the options that change
+  # what the commands do and the chain, the least recently used texts go first
+  def __init__(self, dir, size):
+    import collections
+    self.dir = os.path.expanduser(dir) if dir else None
+    self.limit = size << 20
+    self.entries = collections.OrderedDict()
+    self.size = 0
+    self.hits = self.misses = self.reused = 0
+    if self.dir:
+      os.makedirs(self.dir, exist_ok=True)
+
+  def __reduce__(self):
+    # a worker process starts out with nothing in memory
+    return PrefixCache, (self.dir, self.limit >> 20)
+
+  def keys(self, args, contents, commands):
+    # one key for each prefix of the commands, the hash of one goes on into the next
+    import hashlib
+    options = (args.insensitive, args.multiline, args.dotall, args.ascii, args.fixed, args.ending, args.normalize,
+      args.eof, args.maxsub, args.maxlinesub, args.maxcount)
+    digest = hashlib.blake2b(contents.encode('utf-8', 'surrogatepass'), digest_size=20)
+    digest.update(repr(options).encode())
+    keys = []
+    for cmd in commands:
+      if cmd.op in [LINE_MAP, FILE_MAP]:
+        # a map file may be changed between runs
+        st = os.stat(cmd.text)
+        digest.update(f'{cmd.item}\0{st.st_size}\0{st.st_mtime_ns}'.encode('utf-8', 'surrogatepass'))
+      else:
+        digest.update(str(cmd).encode('utf-8', 'surrogatepass'))
+      digest.update(b'\0')
+      keys.append(digest.copy().hexdigest())
+    return keys
+
+  def find(self, keys):
+    # the number of commands the longest cached prefix has and the text after it
+    for done in range(len(keys), 0, -1):
+      data = self.get(keys[done - 1])
+      if data is not None:
+        self.hits += 1
+        self.reused = done
+        return done, data
+    self.misses += 1
+    self.reused = 0
+    return 0, None
+
+  def get(self, key):
+    data = self.entries.get(key)
+    if data is not None:
+      self.entries.move_to_end(key)
+    elif self.dir:
+      import marshal
+      path = os.path.join(self.dir, key)
+      try:
+        with open(path, 'rb') as f:
+          data = marshal.load(f)
+        os.utime(path)
+      except (OSError, EOFError, ValueError, TypeError):
+        return None
+      self.keep(key, data)
+    # the commands may change a list of lines in place
+    return list(data) if isinstance(data, list) else data
+
+  def store(self, key, data):
+    data = list(data) if isinstance(data, list) else data
+    if self.keep(key, data) and self.dir:
+      import marshal
+      import tempfile
+      fd, temp = tempfile.mkstemp(dir=self.dir, prefix='.')
+      try:
+        with os.fdopen(fd, 'wb') as f:
+          marshal.dump(data, f)
+        os.replace(temp, os.path.join(self.dir, key))
+      except BaseException:
+        os.unlink(temp)
+        raise
+      self.trim_dir()
+
+  def keep(self, key, data):
+    size = text_size(data)
+    if size > self.limit:
+      return False
+    if key in self.entries:
+      self.size -= text_size(self.entries.pop(key))
+    self.entries[key] = data
+    self.size += size
+    while self.size > self.limit:
+      self.size -= text_size(self.entries.popitem(last=False)[1])
+    return True
+
+  def trim_dir(self):
+    files = []
+    with os.scandir(self.dir) as entries:
+      for entry in entries:
+        if entry.is_file() and not entry.name.startswith('.'):
+          st = entry.stat()
+          files.append((st.st_mtime_ns, st.st_size, entry.path))
+    total = sum(size for mtime, size, path in files)
+    for mtime, size, path in sorted(files):
+      if total <= self.limit:
+        break
+      try:
+        os.unlink(path)
+      except FileNotFoundError:
+        pass
+      total -= size
+
+  def figures(self):
+    return {'hits': self.hits, 'misses': self.misses, 'reused': self.reused, 'entries': len(self.entries),
+      'bytes': self.size}
+
+def text_size(data):
+  # about the bytes the text takes up
+  return sum(len(line) + 8 for line in data) if isinstance(data, list) else len(data)
+
+class Stats:
+  # per step and per command figures for --stats, the wrapping only happens when they are wanted
+  def __init__(self, args):
+    import time
+    self.clock = time.perf_counter
+    self.cpu_clock = time.process_time
+    self.start = self.last = self.clock()
+    self.times = {}
+    self.steps = []
+
+  def mark(self, name):
+    now = self.clock()
+    self.times[name] = self.times.get(name, 0) + now - self.last
+    self.last = now
+
+  def apply(self, args, step, data):
+    self.mark('edit')
+    if isinstance(step, LinePass):
+      name, commands, lines = 'line pass', [], True
+    elif isinstance(step, EditPass):
+      name, commands, lines = f'{"line" if step.edits == EDIT_LINES else "character"} edits', step.commands, step.edits == EDIT_LINES
+    else:
+      name, commands, lines = 'whole buffer', [step], step.op not in TEXT_OPS
+    entry = {'step': name, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, **data_size(args, data, 'in'),
+      'conversion': None if lines == isinstance(data, list) else ('text to lines' if lines else 'lines to text'),
+      'commands': [command_stats(cmd, count_matches(args, cmd, data)) for cmd in commands]}
+    self.overhead = 0.0
+    wall, cpu = self.clock(), self.cpu_clock()
+    if isinstance(step, LinePass):
+      data = step.apply(args, data, self.wrapper(args, entry['commands']))
+    elif isinstance(step, EditPass):
+      data = step.apply(args, data, self.edit_wrapper(entry['commands']))
+    else:
+      data = step.apply(args, data)
+    # less the counting done by the line pass wrapper as it went
+    entry['wall_seconds'] = self.clock() - wall - self.overhead
+    entry['cpu_seconds'] = max(self.cpu_clock() - cpu - self.overhead, 0.0)
+    self.times['edit'] += entry['wall_seconds']
+    entry.update(data_size(args, data, 'out'))
+    if not isinstance(step, LinePass) and len(commands) == 1:
+      entry['commands'][0].update({key: entry[key] for key in entry['commands'][0] if key in entry})
+    self.steps.append(entry)
+    self.last = self.clock()
+    return data
+
+  def wrapper(self, args, commands):
+    # times and counts every call of each command's feed, the counting is kept out of the time
+    clock, cpu_clock = self.clock, self.cpu_clock
+    ending = len(args.ending.encode())
+    def wrap(cmd, feed, finish):
+      counts = command_stats(cmd, 0 if cmd.regex else None, 0)
+      commands.append(counts)
+      finditer = cmd.regex.finditer if cmd.regex else None
+      feed = feed or (lambda line: line)
+      def add(lines, key):
+        for line in [] if lines is None else [lines] if isinstance(lines, str) else lines:
+          counts[f'lines_{key}'] += 1
+          counts[f'bytes_{key}'] += (len(line) if line.isascii() else len(line.encode())) + ending
+      def timed_feed(line):
+        cpu = cpu_clock()
+        start = clock()
+        out = feed(line)
+        end = clock()
+        counts['cpu_seconds'] += cpu_clock() - cpu
+        counts['wall_seconds'] += end - start
+        add(line, 'in')
+        add(out, 'out')
+        if finditer:
+          counts['matches'] += sum(1 for _ in finditer(line))
+        self.overhead += clock() - end
+        return out
+      def timed_finish():
+        cpu = cpu_clock()
+        start = clock()
+        out = finish()
+        end = clock()
+        counts['cpu_seconds'] += cpu_clock() - cpu
+        counts['wall_seconds'] += end - start
+        add(out, 'out')
+        self.overhead += clock() - end
+        return out
+      return timed_feed, timed_finish
+    return wrap
+
+  def edit_wrapper(self, commands):
+    # times each command of a run of edits on one piece table, in the order they are made
+    counts = iter(commands)
+    def wrap(cmd, edit):
+      figures = next(counts)
+      figures.update(wall_seconds=0.0, cpu_seconds=0.0)
+      def timed_edit(*edit_args):
+        cpu, start = self.cpu_clock(), self.clock()
+        edit(*edit_args)
+        figures['wall_seconds'] += self.clock() - start
+        figures['cpu_seconds'] += self.cpu_clock() - cpu
+      return timed_edit
+    return wrap
+
+  def report(self, args):
+    import json
+    try:
+      import resource
+      # kilobytes, except on macOS
+      peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    except ImportError:
+      peak = None
+    stats = {'path': args.path, 'read_seconds': self.times.get('read', 0), 'edit_seconds': self.times.get('edit', 0),
+      'write_seconds': self.times.get('write', 0), 'total_seconds': self.clock() - self.start,
+      'peak_memory_bytes': peak, 'steps': self.steps}
+    if args.cache:
+      stats['cache'] = args.cache.figures()
+    if args.stats == 'json':
+      print(json.dumps(stats), file=sys.stderr)
+      return
+    lines = [f'{stats["path"]}: read {stats["read_seconds"]:.4f}s, edit {stats["edit_seconds"]:.4f}s, '
+      f'write {stats["write_seconds"]:.4f}s, total {stats["total_seconds"]:.4f}s, '
+      f'peak memory {"unknown" if peak is None else f"{peak / (1 << 20):.1f} MB"}']
+    if args.cache:
+      cache = stats['cache']
+      lines.append(f'  cache: {cache["reused"]} commands reused, {cache["hits"]} hits, {cache["misses"]} misses, '
+        f'{cache["entries"]} entries, {cache["bytes"] / (1 << 20):.1f} MB')
+    for n, step in enumerate(self.steps, 1):
+      conversion = f', {step["conversion"]}' if step['conversion'] else ''
+      lines.append(f'  {n}. {step["step"]}: {step["wall_seconds"]:.4f}s, cpu {step["cpu_seconds"]:.4f}s, '
+        f'{size_str(step)}{conversion}')
+      for cmd in step['commands']:
+        figures = [] if cmd['wall_seconds'] is None else [f'{cmd["wall_seconds"]:.4f}s']
+        figures += [] if cmd['cpu_seconds'] is None else [f'cpu {cmd["cpu_seconds"]:.4f}s']
+        figures += [] if cmd['matches'] is None else [f'{cmd["matches"]} matches']
+        figures += [] if cmd['lines_in'] is None else [size_str(cmd)]
+        lines.append(f'       {cmd["command"]}' + (': ' + ', '.join(figures) if figures else ''))
+    print(os.linesep.join(lines), file=sys.stderr)
+
+def command_stats(cmd, matches, count=None):
+  # the figures of a command that shares a step with others are only known in a line pass
+  return {'command': str(cmd), 'wall_seconds': count, 'cpu_seconds': count, 'matches': matches,
+    'lines_in': count, 'lines_out': count, 'bytes_in': count, 'bytes_out': count}
+
+def data_size(args, data, key):
+  if isinstance(data, list):
+    lines = len(data)
+    size = sum(len(line) if line.isascii() else len(line.encode()) for line in data)
+    size += len(args.ending.encode()) * (lines if args.eof else max(lines - 1, 0))
+  else:
+    lines = data.count('\n') + (1 if data and not data.endswith('\n') else 0)
+    # a block at a time, so measuring doesn't add a copy of the data to the peak memory
+    size = sum(len(data[i:i + STREAM_BLOCK].encode()) for i in range(0, len(data), STREAM_BLOCK))
+  return {f'lines_{key}': lines, f'bytes_{key}': size}
+
+def count_matches(args, cmd, data):
+  if cmd.regex is None:
+    return None
+  if cmd.op in TEXT_OPS:
+    return sum(1 for _ in cmd.regex.finditer(get_string(args, data)))
+  return sum(1 for line in iter_lines(args, data) for _ in cmd.regex.finditer(line))
+
+def size_str(counts):
+  return (f'{counts["lines_in"]} -> {counts["lines_out"]} lines, '
+    f'{counts["bytes_in"]} -> {counts["bytes_out"]} bytes')
+
+def edit_batch(args, plan, paths):
+  jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+  counts = {'changed': 0, 'unchanged': 0, 'failed': 0}
+  first_error = None
+  executor = None
+  if jobs == 1 or len(paths) < 2:
+    results = (edit_file(args, plan, path) for path in paths)
+  else:
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=min(jobs, len(paths)), initializer=init_worker, initargs=(args,))
+    # map() hands back results in the order of the paths, so stdout stays deterministic
+    results = executor.map(edit_file_worker, paths, chunksize=max(1, min(64, len(paths) // (jobs * 4))))
+  try:
+    for path, changed, output, error in results:
+      if error:
+        counts['failed'] += 1
+        first_error = first_error or error
+        print(f'{path}: {error[0]}', file=sys.stderr)
+        continue
+      counts['changed' if changed else 'unchanged'] += 1
+      if output:
+        sys.stdout.write(output)
+  finally:
+    if executor:
+      executor.shutdown(cancel_futures=True)
+  sys.stdout.flush()
+  print(f'{len(paths)} files: {counts["changed"]} changed, {counts["unchanged"]} unchanged, '
+    f'{counts["failed"]} failed', file=sys.stderr)
+  if first_error:
+    raise PedError(f'Error: {counts["failed"]} of {len(paths)} files failed', PedErrorTypes(first_error[1]))
+  return counts['changed'] > 0
+
+def edit_file(args, plan, path):
+  import copy
+  import io
+  file_args = copy.copy(args)
+  file_args.path = path
+  # the whole file is needed anyway to tell whether it changed
+  file_args.buffered = True
+  out = io.StringIO()
+  try:
+    changed = edit(file_args, plan, out)
+  except Exception as e:
+    error = ped_error(e)
+    return path, False, None, (error.msg, int(error.type))
+  return path, changed, out.getvalue(), None
+
+def explain_plan(args, plan):
+  mode = 'streaming' if is_streamable(args, plan) else 'buffered'
+  mode = 'memory mapped if the input allows' if is_mappable(args, plan) else mode
+  if mode == 'buffered' and args.window and not args.buffered and not window_error(args, plan):
+    mode = f'windowed, {args.window} characters'
+  if mode == 'streaming' and args.parallel and not parallel_error(args, plan):
+    mode = f'streaming, in chunks over {args.parallel} processes'
+  lines = [f'{len(plan)} step{"" if len(plan) == 1 else "s"}, {mode}:']
+  for n, step in enumerate(plan, 1):
+    if isinstance(step, LinePass):
+      lines.append(f'  {n}. line pass')
+      lines += [f'       {cmd}' for cmd in step.commands]
+    elif isinstance(step, EditPass):
+      lines.append(f'  {n}. {"line" if step.edits == EDIT_LINES else "character"} edits')
+      lines += [f'       {cmd}' for cmd in step.commands]
+    else:
+      lines.append(f'  {n}. whole buffer')
+      lines.append(f'       {step}')
+  return os.linesep.join(lines) + os.linesep
+
+def window_error(args, plan):
+  if args.window < 0:
+    return 'Error: --window must be a positive number of characters'
+  for step in plan:
+    if isinstance(step, EditPass):
+      return f'Error: the "{step.commands[0].item}" command can not run in a --window'
+    if isinstance(step, Command) and step.op not in WINDOW_OPS:
+      return f'Error: the "{step.item}" command can not run in a --window'
+    if isinstance(step, Command) and step.regex is not None and \
+        max(lookaround_width(step.regex.pattern, step.regex.flags)) > args.window:
+      return f'Error: the "{step.item}" command looks around further than the {args.window} character window'
+  return None
+
+def run_windowed(args, plan):
+  # every step turns a stream of text blocks into another one
+  if args.normalize:
+    blocks = join_blocks(args, read_lines(args))
+  else:
+    blocks = read_blocks(args) if args.path == '-' else translate_newlines(read_blocks(args))
+  for step in plan:
+    if isinstance(step, LinePass):
+      blocks = join_blocks(args, step.run(args, split_blocks(blocks)))
+    else:
+      blocks = window_blocks(args, step, blocks)
+  return blocks
+
+def translate_newlines(blocks):
+  # \r\n and \r as \n, the way read_contents has a file, a \r at the end of a block waits for the
+  # next block in case it starts with the \n
+  carry = ''
+  for block in blocks:
+    block = carry + block
+    carry = '\r' if block.endswith('\r') else ''
+    yield block[:len(block) - len(carry)].replace('\r\n', '\n').replace('\r', '\n')
+  if carry:
+    yield '\n'
+
+def parallel_error(args, plan):
+  if args.parallel < 0:
+    return 'Error: --parallel must be a positive number of processes'
+  for step in plan:
+    if not isinstance(step, LinePass):
+      return f'Error: the "{(step if isinstance(step, Command) else step.commands[0]).item}" command can not ' \
+        'run with --parallel'
+  if args.maxsub or args.maxcount:
+    return 'Error: --max-substitutions and --max-count count over the whole file and can not be used with --parallel'
+  for cmd in plan[0].commands if plan else []:
+    # line numbers count from the start of the file
+    if cmd.op == LINE_INSERT:
+      return f'Error: the "{cmd.item}" command can not run with --parallel'
+    # splitting lines drops a last empty line, which only the last chunk could tell
+    if not args.eof and may_split(cmd):
+      return f'Error: the "{cmd.item}" command can not run with --parallel and --no-eof'
+  return None
+
+def may_split(cmd):
+  # whether the command can put a \n inside a line, which has the line split again
+  if cmd.op == LINE_MAP:
+    return any('\n' in text for text in cmd.table.values())
+  if cmd.op in [LINE_SUB, LINE_FIXED_SUB]:
+    return '\n' in cmd.repl or '\\n' in cmd.repl
+  return cmd.op in [LINE_APPEND, LINE_PREPEND, LINE_INSERT] and '\n' in cmd.text
+
+def edit_parallel(args, plan, out):
+  spans = chunk_spans(args)
+  if len(spans) < 2:
+    return False
+  # joined the way join_blocks joins batches, a chunk without any line left adds nothing
+  sep = ''
+  for text, lines in chunk_results(args, spans):
+    if lines:
+      out.write(sep)
+      out.write(text)
+      sep = args.ending
+  if sep and args.eof:
+    out.write(args.ending)
+  return True
+
+def chunk_spans(args):
+  # byte ranges of about PARALLEL_CHUNK that end after a \n, so no line or character is cut
+  import mmap
+  with open(args.path, 'rb') as f:
+    size = os.fstat(f.fileno()).st_size
+    if size <= PARALLEL_CHUNK:
+      return [(0, size)]
+    spans = []
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      start = 0
+      while start < size:
+        end = mm.find(b'\n', start + PARALLEL_CHUNK - 1) + 1 or size
+        spans.append((start, end))
+        start = end
+  return spans
+
+def chunk_results(args, spans):
+  import collections
+  from concurrent.futures import ProcessPoolExecutor
+  jobs = min(args.parallel, len(spans))
+  executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(args,))
+  # a few chunks queued ahead of the processes, so only that many results are ever held
+  pending = collections.deque()
+  try:
+    for n, (start, end) in enumerate(spans):
+      pending.append(executor.submit(edit_chunk_worker, start, end, n == 0, n == len(spans) - 1))
+      if len(pending) > jobs * 2:
+        yield pending.popleft().result()
+    while pending:
+      yield pending.popleft().result()
+  finally:
+    executor.shutdown(cancel_futures=True)
+
+def window_blocks(args, cmd, blocks):
+  if cmd.op == FILE_PREPEND:
+    yield cmd.text
+  if cmd.op in [FILE_APPEND, FILE_PREPEND]:
+    yield from blocks
+    if cmd.op == FILE_APPEND:
+      yield cmd.text
+    return
+  regex, repl, window = cmd.regex, cmd.repl, args.window
+  # a lookahead after the end of a match has to fit in the window too
+  ahead = lookaround_width(regex.pattern, regex.flags)[0]
+  only = cmd.op == FILE_ONLY
+  expand = isinstance(repl, str) and '\\' in repl
+  left = args.maxsub if args.maxsub > 0 and not only else -1
+  blocks = iter(blocks)
+  buf = ''
+  pos = 0
+  offset = 0
+  last_empty = False
+  eof = False
+  while not eof and left:
+    block = next(blocks, None)
+    eof = block is None
+    buf += block or ''
+    # a match is only trusted once the window after its start, plus one character for `$`
+    # before a final line ending, has been read
+    limit = len(buf) + 1 if eof else len(buf) - window - 1
+    out = []
+    first = True
+    for match in regex.finditer(buf, pos):
+      start, end = match.span()
+      if start >= limit:
+        break
+      if first and last_empty and start == end == pos:
+        # resuming after an empty match, re.sub() would not match empty here again
+        first = False
+        continue
+      first = False
+      if end - start + ahead > window:
+        raise PedError(f'Error: a match of "{cmd.item}" at character {offset + start} is longer than '
+          f'the {window} character window', PedErrorTypes.PED_OTHER_ERROR)
+      if not only:
+        out.append(buf[pos:start])
+      out.append(match[0] if only else repl(match) if callable(repl) else match.expand(repl) if expand
+        else repl)
+      pos = end
+      last_empty = start == end
+      left -= 1
+      if not left:
+        break
+    if left and min(limit, len(buf)) > pos:
+      # nothing more can match before the limit
+      if not only:
+        out.append(buf[pos:limit])
+      pos = min(limit, len(buf))
+      last_empty = False
+    if out:
+      yield ''.join(out)
+    # keep enough text before pos for lookbehind, `\b` and `^`
+    cut = pos - window
+    if cut > 0:
+      buf = buf[cut:]
+      pos -= cut
+      offset += cut
+  if not only:
+    yield buf[pos:]
+    yield from blocks
+
+@functools.lru_cache(maxsize=REGEX_CACHE)
+def lookaround_width(pattern, flags):
+  # the most characters all the lookaheads and all the lookbehinds of a pattern can look at, as
+  # (ahead, behind), very large when one has no limit
+  tree, sre = parse_regex(pattern, flags)
+  widths = [0, 0]
+
+  def walk(av):
+    for value in av if isinstance(av, (tuple, list)) else [av]:
+      if isinstance(value, tree.__class__):
+        scan(value)
+      elif isinstance(value, (tuple, list)):
+        walk(value)
+
+  def scan(items):
+    for op, av in items:
+      if op == sre.ASSERT or op == sre.ASSERT_NOT:
+        widths[av[0] < 0] += av[1].getwidth()[1]
+      walk(av)
+
+  scan(tree)
+  return tuple(widths)
+
+def load_map(path):
+  if path.lower().endswith('.json'):
+    import json
+    try:
+      pairs = json.loads(get_file_contents(path))
+    except json.JSONDecodeError as e:
+      raise PedError(f'Error: map file "{path}" is not valid JSON - {e.msg}', PedErrorTypes.PED_OTHER_ERROR)
+    pairs = pairs.items() if isinstance(pairs, dict) else pairs
+  else:
+    pairs = []
+    for n, line in enumerate(get_file_contents(path).splitlines(), 1):
+      if line:
+        pair = line.split('\t', 1)
+        if len(pair) != 2:
+          raise PedError(f'Error: map file "{path}" line {n} is not a tab separated pair', PedErrorTypes.PED_OTHER_ERROR)
+        pairs.append(pair)
+  table = {}
+  for old, new in pairs:
+    if not isinstance(old, str) or not isinstance(new, str) or not old:
+      raise PedError(f'Error: map file "{path}" has an empty or non string entry: {old!r}', PedErrorTypes.PED_OTHER_ERROR)
+    table[old] = new
+  return table
+
+def map_regex(table, flags):
+  # the keys as a trie shaped regex, so a match only follows the branches that fit the text instead
+  # of trying every key, and an optional tail after a complete key makes the longest key win
+  trie = {}
+  for key in table:
+    node = trie
+    for c in key:
+      node = node.setdefault(c, {})
+    node[''] = None
+  return compile_regex(trie_pattern(trie) if trie else '(?!)', flags)
+
+def trie_pattern(node):
+  branches = []
+  for c, child in sorted((c, child) for c, child in node.items() if c):
+    text = c
+    while len(child) == 1 and '' not in child:
+      c, child = next(iter(child.items()))
+      text += c
+    branches.append(re.escape(text) + (trie_pattern(child) if child.keys() - {''} else ''))
+  if not branches:
+    return ''
+  if len(branches) == 1:
+    pattern = branches[0]
+    group = len(pattern) > 1
+  elif all(len(branch) == 1 for branch in branches):
+    pattern = f'[{"".join(branches)}]'
+    group = False
+  else:
+    pattern = '|'.join(branches)
+    group = True
+  if '' not in node:
+    return f'(?:{pattern})' if len(branches) > 1 and group else pattern
+  return f'(?:{pattern})?' if group else f'{pattern}?'
+
+def map_repl(table, regex):
+  # with -i the keys match the way re ignores case, a match is looked up with casefold() on both
+  # sides, and of the keys that fold alike the last one wins
+  if not regex.flags & re.IGNORECASE:
+    return lambda match: table[match[0]]
+  folded = {key.casefold(): text for key, text in table.items()}
+  def repl(match):
+    text = match[0]
+    key = text.casefold()
+    if key in folded:
+      return folded[key]
+    # a character re takes for another that casefold() doesn't
+    return next(table[key] for key in reversed(table) if re.fullmatch(re.escape(key), text, regex.flags))
+  return repl
+
+def help_formatter():
+  # only help needs it, and argparse with it
+  import argparse
+
+  class CustomFormatter(argparse.HelpFormatter):
+    def _flow(self, text):
+      lines = text.splitlines()
+      new_text = lines[0]
+      last = True
+      for line in lines[1:]:
+        cur = line.strip() != '' and line[0] != ' '
+        new_text += (' ' if last and cur else os.linesep) + line
+        last = cur
+      return new_text
+
+    def _format_text(self, text):
+      import textwrap
+      text_width = max(self._width - self._current_indent, 11)
+      indent = ' ' * self._current_indent
+      if '<mark-over>' in text:
+        lines = []
+        for line in self._flow(text).splitlines():
+          line = re.sub(r'<mark-over>', '', line)
+          if line.strip() == '':
+            lines.append(line)
+          elif line[0] == ' ':
+            spaces = (len(line) - len(line.lstrip()))
+            lines = lines + textwrap.wrap(line.lstrip(), text_width, initial_indent=' '*spaces, subsequent_indent=' '*spaces*2)
+          else:
+            line = re.sub(r'\s{2,}', ' ', line)
+            lines = lines + textwrap.wrap(line, text_width, initial_indent=indent, subsequent_indent=indent)
+        return os.linesep.join(lines) + '\n\n'
+
+  return CustomFormatter
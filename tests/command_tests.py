@@ -201,6 +201,10 @@ class TestCommands(unittest.TestCase):
     self.assertEqual(out, 'this is a test\n123456\n')
     out = run_args(['-f', short_path, 'y/0/2/123456'])
     self.assertEqual(out, '123456\nand you might be special.\n')
+    out = run_args(['-f', short_path, 'y/-2/2/123456'])
+    self.assertEqual(out, 'this is a test\n123456\n')
+    out = run_args(['-f', short_path, 'y/-9/1/123456\n7'])
+    self.assertEqual(out, '123456\n7\nof this thing here \nand you might be special.\n')
     
   def test_replace_chars(self):
     out = run_args(['-f', abcdef_path, 'Y/0/0/123456'])
@@ -225,6 +229,10 @@ class TestCommands(unittest.TestCase):
     self.assertEqual(out, 'this is a test\nof this thing here \n')
     out = run_args(['-f', short_path, 'd/0/2/123456'])
     self.assertEqual(out, 'and you might be special.\n')
+    out = run_args(['-f', short_path, 'd/-2/2'])
+    self.assertEqual(out, 'this is a test\n')
+    out = run_args(['-f', short_path, 'd/1/-1'])
+    self.assertEqual(out, 'this is a test\nof this thing here \nand you might be special.\n')
     
   def test_delete_chars(self):
     out = run_args(['-f', abcdef_path, 'D/2/2'])
@@ -238,6 +246,36 @@ class TestCommands(unittest.TestCase):
     out = run_args(['-f', short_path, 'D/-32/200'])
     self.assertEqual(out, 'this is a test\nof this thing')
 
+  def test_map(self):
+    import tempfile
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      tsv_path = os.path.join(temp_dir, 'map.tsv')
+      json_path = os.path.join(temp_dir, 'map.json')
+      with open(tsv_path, 'w') as f:
+        f.write('this\tthat\nthis is\tit was\n\nhe\tshe\nt\tT\n')
+      with open(json_path, 'w') as f:
+        f.write('{"test\\nof": "-", "ing": "ING"}')
+      out = run_args(['-f', short_path, f'm/{tsv_path}'])
+      self.assertEqual(out, 'it was a TesT\nof that Thing shere \nand you mighT be special.\n')
+      out = run_args(['-f', short_path, '--map', tsv_path])
+      self.assertEqual(out, 'it was a TesT\nof that Thing shere \nand you mighT be special.\n')
+      out = run_args(['-f', short_path, '-i', '-M', '2', f'M:{tsv_path}', f'M:{json_path}'])
+      self.assertEqual(out, 'it was a - this thING here \nand you might be special.')
+      out = run_args(['-f', short_path, '-L', '1', 's/ a /\\n/', f'm/{tsv_path}'])
+      self.assertEqual(out, 'it was\nTest\nof that thing here \nand you mighT be special.\n')
+      with open(tsv_path, 'a') as f:
+        f.write('oops\n')
+      with self.assertRaises(ped.PedError) as e:
+        run_args(['-f', short_path, f'm/{tsv_path}'])
+      self.assertIn('line 6 is not a tab separated pair', e.exception.msg)
+      # -i matches the keys the way a substitution ignores case
+      with open(tsv_path, 'w', encoding='utf-8') as f:
+        f.write('İstanbul\tX\nſtop\tY\nStraße\tZ\n')
+      text = 'İstanbul, istanbul, ISTANBUL, stop STOP ſtop, STRASSE straße\n'
+      out = run_piped(['-i', f'm/{tsv_path}'], text)
+      self.assertEqual(out, run_piped(['-i', 's/İstanbul/X/', 's/ſtop/Y/', 's/Straße/Z/'], text))
+      self.assertEqual(out, 'X, X, X, Y Y Y, STRASSE Z\n')
+
   # def test_bad_regexp(self):
   #   out = run_args(['-f', abcdef_path, 'D/2/2'])
   #   with self.assertRaises(TypeError):
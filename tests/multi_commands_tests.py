@@ -8,6 +8,7 @@ import glob
 from io import StringIO
 from unittest.mock import patch
 import os
+import re
 from test_utils import *
 
 short_text = 'this is a test\nof this thing here \nand you might be special.'
@@ -50,6 +51,59 @@ class TestMultipleCommands(unittest.TestCase):
     out = run_piped(['y/1/1/xx\nyy\nzz', 's/^/> /'], 'a\nb\nc')
     self.assertEqual(out, '> a\n> xx\n> yy\n> zz\n> c\n')
 
+  def test_fused(self):
+    out = run_piped(['s/a/x\ny/', 'g/^[a-x]', 's/$/!/', 'x/^c'], 'abc\nbcd\ncde\n')
+    self.assertEqual(out, 'x!\nbcd!\n')
+    out = run_piped(['-Z', 'g/b', 'a/end\n', 's/^/> /'], 'abc\nbcd\ncde\n')
+    self.assertEqual(out, '> abc\n> bcd\n> end')
+    out = run_piped(['s/b/\\r/', 's/c/\n/', 'u/d'], 'abc\nbcd\n')
+    self.assertEqual(out, 'a\n\n\nD\n')
+
+  def test_prefilter(self):
+    self.assertEqual(ped.required_literal(r'\d+ ERROR.*timeout', 0), ('timeout', False))
+    self.assertEqual(ped.required_literal(r'(?:v(er)+sion)? = "(\d+)"', re.IGNORECASE), (' = "', True))
+    self.assertEqual(ped.required_literal('ab|cd', 0), None)
+    self.assertEqual(ped.required_literal('ſtop', re.IGNORECASE), None)
+    lines = [f'{n} INFO took {n % 300}ms' for n in range(20000)]
+    lines[7], lines[12345], lines[-1] = '7 ERROR x\r7b timeout', '12345 Error: timeout', 'ERROR.* timeout'
+    text = '\n'.join(lines) + '\n'
+    out = run_piped(['g/\\d+ ERROR.*timeout/'], text)
+    self.assertEqual(out, '')
+    out = run_piped(['-i', 'g/\\d+ ERROR.*timeout/'], text)
+    self.assertEqual(out, '12345 Error: timeout\n')
+    out = run_piped(['-F', 's/ERROR.* /E/'], text)
+    self.assertEqual(out, text.replace('\r', '\n').replace('ERROR.* ', 'E'))
+    # a line only gets the literal of the filter from a substitution before it
+    out = run_piped(['s/took 29\\dms/FAST/', 'g/FAST/', 's/^/> /'], text)
+    self.assertEqual(out, ''.join(f'> {n} INFO FAST\n' for n in range(20000) if n % 300 // 10 == 29))
+    out = run_piped(['-i', 'x/info took/'], text.replace('12345', 'KK'))
+    self.assertEqual(out, '7 ERROR x\n7b timeout\nKK Error: timeout\nERROR.* timeout\n')
+    # a bad template is an error even when no line has the literal
+    for args in [[], ['--buffered'], ['-Z']]:
+      with self.assertRaises(ped.PedError) as e:
+        run_piped(args + ['s/abcq/\\2/'], text)
+      self.assertEqual(e.exception.type, ped.PedErrorTypes.PED_RE_ERROR)
+
+  def test_positional_edits(self):
+    text = ''.join(f'{n}\n' for n in range(10))
+    out = run_piped(['i/2/a', 'd/-3/2', 'y/0/3/b\nc', 'i/-1/d', 'd/100/1'], text)
+    self.assertEqual(out, 'b\nc\n2\n3\n4\n5\n6\nd\n9\n')
+    out = run_piped(['-Z', 'I/2/ab', 'D/-4/3', 'Y/1/2/-', 'I/-100/<', 'i/1/x'], text)
+    self.assertEqual(out, '<0-b1\nx\n2\n3\n4\n5\n6\n7\n')
+    out = run_args(['--explain', 'i/2/a', 'd/-3/2', 'I/2/b', 'Y/1/2/c'])
+    self.assertEqual(out, "3 steps, buffered:\n  1. line pass\n       i at 2 'a'\n  2. line edits\n"
+      "       d at -3 count 2\n  3. character edits\n       I at 2 'b'\n       Y at 1 count 2 'c'\n")
+
+  def test_mixed(self):
+    text = ''.join(f'{n} ab\n' for n in range(20))
+    out = run_piped(['s/a/x/', 'S/1 /one /', 'g/one/', 'U/b/', 'y/1/2/-', 'd/-1/1', 'S/$/!/'], text)
+    self.assertEqual(out, 'one xB!\n!')
+    out = run_piped(['-Z', 's/a/x/', 'S/x/y/', 'y/-1/1/z', 'g/9|z/'], text)
+    self.assertEqual(out, '9 yb\nz')
+    # a line with a \r in it is only split again by the commands that re-split lines
+    out = run_piped(['i/1/a\rb', 'a/c\nd'], '1\n2\n')
+    self.assertEqual(out, '1\na\nb\n2\nc\nd\n')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -35,6 +35,9 @@ class TestOptions(unittest.TestCase):
     self.assertEqual(out, 'abcdef\r')
     out = run_args(['-n', '-f', abcdef_path, '--line-ending', ':'])
     self.assertEqual(out, 'abcdef:')
+    # lines joined with another ending are one line to the commands after
+    for cmds, expected in [(['g/a'], 'ab;cd;ab;;'), (['u/a', 'x/c'], ''), (['u/b'], 'aB;cd;aB;;')]:
+      self.assertEqual(run_piped(['-E', ';', '-n'] + cmds, 'ab\ncd\nab\n'), expected)
 
   def test_delimiters(self):
     out = run_piped(['S:this:------'], 'this or that, that or this')
@@ -57,6 +60,29 @@ class TestOptions(unittest.TestCase):
       text = file_get_contents(temp_path)
       self.assertEqual(text, 'th-s -s - t-st\n-f th-s th-ng h-r- \n-nd y-- m-ght b- sp-c--l.\n')
 
+  def test_inplace_atomic(self):
+    import tempfile
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      temp_path = os.path.join(temp_dir, 'shorty.txt')
+      backup_dir = os.path.join(temp_dir, 'bak')
+      with open(temp_path, 'w') as f:
+        f.write(short_text + '\n')
+      os.chmod(temp_path, 0o640)
+      before = os.stat(temp_path)
+      run_args(['-e', '-b', backup_dir, '-f', temp_path, 's/xyz/-'])
+      self.assertEqual(os.stat(temp_path), before)
+      self.assertFalse(os.path.exists(backup_dir))
+      link_path = os.path.join(temp_dir, 'link.txt')
+      os.symlink(temp_path, link_path)
+      run_args(['-e', '-b', backup_dir, '-f', link_path, '--window', '10', 'S/i(s)/\\1/'])
+      self.assertTrue(os.path.islink(link_path))
+      self.assertEqual(file_get_contents(temp_path), short_text.replace('is', 's') + '\n')
+      self.assertEqual(os.stat(temp_path).st_mode & 0o777, 0o640)
+      backups = os.listdir(backup_dir)
+      self.assertEqual(len(backups), 1)
+      self.assertEqual(os.stat(os.path.join(backup_dir, backups[0])).st_ino, before.st_ino)
+      self.assertEqual(sorted(os.listdir(temp_dir)), ['bak', 'link.txt', 'shorty.txt'])
+
   def test_ignore_case(self):
     out = run_args(['-i', '-f', short_path, 's/[aeIOU]/-'])
     self.assertEqual(out, 'th-s -s - t-st\n-f th-s th-ng h-r- \n-nd y-- m-ght b- sp-c--l.\n')
@@ -135,5 +161,326 @@ class TestOptions(unittest.TestCase):
     out = run_piped(['--line-max-sub', '2', 's/[aeiou]/-'], 'abcdefghijklmnopqrstuvwxyz\nabcdefghijklmnopqrstuvwxyz')
     self.assertEqual(out, '-bcd-fghijklmnopqrstuvwxyz\n-bcd-fghijklmnopqrstuvwxyz\n')
 
+  def test_max_count(self):
+    text = 'abc\nbcd\ncde\ndef\n'
+    out = run_piped(['--max-count', '2', 'g/c'], text)
+    self.assertEqual(out, 'abc\nbcd\n')
+    out = run_piped(['--max-count', '1', 'x/a', 'o/c.'], text)
+    self.assertEqual(out, 'cd\n')
+    out = run_piped(['--max-count', '1', 'G/.c.|..e', 's/c/C/'], text)
+    self.assertEqual(out, 'bCd\n')
+    # once the limits are used up the rest is copied through as it is
+    text = ''.join(f'{n} version 1.0\r\n' for n in range(20000))
+    for cmds in [['-M', '1', 's/1\\.0/1.1/'], ['-M', '2', 's/version/v/', 'i/3/x', 'a/end\n'], ['--max-count', '3', 'g/99']]:
+      out = run_piped(cmds, text)
+      self.assertEqual(out, run_piped(['--buffered'] + cmds, text))
+    out = run_piped(['-M', '1', 's/1\\.0/1.1/', 'a/end'], text)
+    self.assertEqual(out, '0 version 1.1\n' + text[15:].replace('\r\n', '\n') + 'end\n')
+
+  def test_buffered(self):
+    text = 'abc\r\nbcd\n\nxyz\n\n' * 5000
+    for opts in [[], ['-Z'], ['-M', '3'], ['-n', '-L', '1']]:
+      for cmds in [['s/b/\\n/', 'g/^.'], ['p/top\n', 'x/d', 'a/end\n'], ['f/c/C', 'i/3/mid\n', 'o/[a-c]+']]:
+        out = run_piped(opts + cmds, text)
+        self.assertEqual(out, run_piped(['--buffered'] + opts + cmds, text))
+    out = run_piped(['-Z', 's/c$/\n/'], 'abc\n\n')
+    self.assertEqual(out, 'ab\n')
+    out = run_piped(['--buffered', '-Z', 's/c$/\n/'], 'abc\n\n')
+    self.assertEqual(out, 'ab\n')
+
+  def test_mapped(self):
+    import tempfile
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      path = os.path.join(temp_dir, 'text.txt')
+      for text in ['abc\nbcd\n\nxyz\n' * 3000, 'abç\nbçd\n€xyz\x1c\n' * 3000, 'a\r\nbc\rd\n', '']:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+          f.write(text)
+        for opts in [[], ['-M', '5'], ['-i'], ['-m', '-a']]:
+          for cmd in ['S/b(c|ç)/<\\1>/', 'S/d$/D/', 'S/\\s/_/', 'R/[bx]', 'O/c.', 'O/\\w+', 'S/x*/-/']:
+            out = run_args(opts + ['-f', path, cmd])
+            self.assertEqual(out, run_args(['--buffered'] + opts + ['-f', path, cmd]))
+      with open(path, 'wb') as f:
+        f.write('abç\nbçd\n€xyz\x1c\n'.encode() * 3000)
+      proc = subprocess.run([sys.executable, ped_path, '-f', path, 'S/b(c|ç)/<\\1>/'], capture_output=True)
+      self.assertEqual(proc.stdout, 'a<ç>\n<ç>d\n€xyz\x1c\n'.encode() * 3000)
+      # without a binary stream to write to, a block of the file can end inside a character
+      with open(path, 'wb') as f:
+        f.write(b'x\nyA' + 'é'.encode() * 20)
+      with patch('ped.MAP_BLOCK', 5):
+        self.assertEqual(run_args(['-f', path, 'S/x[\\n]*y/Z/']), 'ZA' + 'é' * 20)
+
+  def test_window(self):
+    import tempfile
+    text = 'Fred Flintstone\nFred\n  Flintstone\nBarney\nRubble\n\n' * 5000
+    for opts in [[], ['-n', '-Z'], ['-M', '3'], ['-m']]:
+      for cmds in [['S/Fred(\\s+)Flintstone/F\\1F/'], ['s/e/E/', 'O/^\\w+$\\n*', 'P/top\n'], ['R/y\\nR', 'T/bar.*']]:
+        out = run_piped(opts + ['--window', '40'] + cmds, text)
+        self.assertEqual(out, run_piped(opts + cmds, text))
+    with self.assertRaises(ped.PedError) as e:
+      run_piped(['--window', '10', 'S/Fred\\s+Flintstone/x/'], text)
+    self.assertIn('longer than the 10 character window', e.exception.msg)
+    text = 'a' + 'b' * 1000 + '\n'
+    for cmd in ['S/a(?=b*z)/X/', 'S/(?<=a.{700})b/X/']:
+      with self.assertRaises(ped.PedError) as e:
+        run_piped(['--window', '100', cmd], text)
+      self.assertIn('looks around further than the 100 character window', e.exception.msg)
+    with self.assertRaises(ped.PedError) as e:
+      run_piped(['--window', '100', 'S/ab{50}(?=b{60})/X/'], text)
+    self.assertIn('longer than the 100 character window', e.exception.msg)
+    self.assertEqual(run_piped(['--window', '100', 'S/ab{30}(?=b{60})/X/'], text), 'X' + 'b' * 970 + '\n')
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      temp_path = os.path.join(temp_dir, 'ab.txt')
+      with open(temp_path, 'w') as f:
+        f.write(text)
+      # a memory mapped file is edited in a window too
+      with self.assertRaises(ped.PedError) as e:
+        run_args(['--window', '100', '-f', temp_path, 'S/ab{200}/X/'])
+      self.assertIn('longer than the 100 character window', e.exception.msg)
+      # the line endings of a file are translated like without a window, block edges included
+      temp_path = os.path.join(temp_dir, 'crlf.txt')
+      with open(temp_path, 'w', newline='') as f:
+        f.write('fred\r\nflintstone\r\nend\r\nold\rmac\r\n' * 50)
+      for block in [ped.STREAM_BLOCK, 5]:
+        with patch('ped.STREAM_BLOCK', block):
+          for cmd in ['S/fred\\nflint/X/', 'S/d$/D/', 'S/d\\nm/_/', 'S/\\r/R/']:
+            for opts in [[], ['-m']]:
+              out = run_args(opts + ['--window', '50', '-f', temp_path, cmd])
+              self.assertEqual(out, run_args(opts + ['-f', temp_path, cmd]))
+    with self.assertRaises(ped.PedError) as e:
+      run_piped(['--window', '10', 'I/3/x'], text)
+    self.assertEqual(e.exception.type, ped.PedErrorTypes.PED_OTHER_ERROR)
+
+  def test_timeout(self):
+    text = 'a' * 40 + '\n'
+    for opts in [[], ['--buffered'], ['-d']]:
+      for cmd in ['S/(a*)*b/x/', 's/(a+)+b/x/']:
+        with self.assertRaises(ped.PedError) as e:
+          run_piped(opts + ['--timeout', '0.2', cmd], text)
+        self.assertEqual(e.exception.type, ped.PedErrorTypes.PED_TIMEOUT_ERROR)
+        self.assertIn(f'"{cmd}" ran longer than the --timeout of 0.2 seconds', e.exception.msg)
+    self.assertEqual(run_piped(['--timeout', '5', 's/a+/b/', 'S/b$/c/'], text), 'c\n')
+    with patch('sys.stderr', new=StringIO()) as err:
+      run_args(['--explain', 's/(\\w+\\s?)*$/x/', 'O/(a|b*)+', 'g/(\\d+,)*', 'S/(ab)+/', 'f/(a+)+/', 'x/( |$)+'])
+    self.assertEqual([line.split('"')[1] for line in err.getvalue().splitlines()], ['s/(\\w+\\s?)*$/x/', 'O/(a|b*)+'])
+    self.assertIn('--timeout', err.getvalue())
+
+  def test_explain(self):
+    out = run_args(['--explain', 's/a/b/', 'g/x', 'S/y/z/', 'u/q'])
+    self.assertEqual(out, "3 steps, buffered:\n  1. line pass\n       s 'a' -> 'b'\n       g 'x'\n"
+      "  2. whole buffer\n       S 'y' -> 'z'\n  3. line pass\n       u 'q' -> upper\n")
+    out = run_args(['--explain', '-i', 's/a/b/', 'x/c'])
+    self.assertEqual(out, "1 step, streaming:\n  1. line pass\n       s 'a' (re.IGNORECASE) -> 'b'\n"
+      "       x 'c' (re.IGNORECASE)\n")
+
+  def test_batch(self):
+    import tempfile
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      for name, text in [('b.txt', 'abc\n'), ('a.txt', 'xyz\n'), ('sub/c.txt', 'cab\n'), ('sub/d.md', 'a\n'),
+          ('skip/e.txt', 'a\n'), ('bad.txt', b'\xff')]:
+        os.makedirs(os.path.dirname(os.path.join(temp_dir, name)), exist_ok=True)
+        with open(os.path.join(temp_dir, name), 'wb') as f:
+          f.write(text if isinstance(text, bytes) else text.encode())
+      with patch('sys.stderr', new=StringIO()) as err:
+        with self.assertRaises(ped.PedError) as e:
+          out = run_args(['-R', '-f', temp_dir, '--include', '*.txt', '--exclude', 'skip', 's/a/A/'])
+      self.assertEqual(e.exception.type, ped.PedErrorTypes.PED_IO_ERROR)
+      self.assertIn('4 files: 2 changed, 1 unchanged, 1 failed', err.getvalue())
+      args = ['-R', '-f', temp_dir, '--include', '*.txt', '--exclude', 'skip', '--exclude', 'bad.txt', 's/a/A/']
+      for jobs in ['1', '2']:
+        proc = subprocess.run([sys.executable, ped_path, '-j', jobs] + args, capture_output=True, encoding='utf-8')
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(proc.stdout, 'xyz\nAbc\ncAb\n')
+        self.assertEqual(proc.stderr, '3 files: 2 changed, 1 unchanged, 0 failed\n')
+      proc = subprocess.run([sys.executable, ped_path, '-e', '-j', '2', '-b', os.path.join(temp_dir, 'bak'),
+        '-f', os.path.join(temp_dir, '*.txt'), '-f', os.path.join(temp_dir, 'sub', 'c.txt'), 's/c/C/'],
+        capture_output=True, encoding='utf-8')
+      self.assertEqual(proc.stdout, '')
+      self.assertEqual(file_get_contents(os.path.join(temp_dir, 'sub', 'c.txt')), 'Cab\n')
+      self.assertEqual(len(os.listdir(os.path.join(temp_dir, 'bak'))), 2)
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      path = os.path.join(temp_dir, '[id].txt')
+      with open(path, 'w') as f:
+        f.write('abc\n')
+      self.assertEqual(run_args(['-f', path, 's/a/A/']), 'Abc\n')
+      run_args(['-e', '-b', os.path.join(temp_dir, 'bak'), '-f', path, 's/b/B/'])
+      self.assertEqual(file_get_contents(path), 'aBc\n')
+      # a pattern that matches nothing is a missing file
+      with patch('sys.stderr', new=StringIO()) as err:
+        with self.assertRaises(ped.PedError) as e:
+          run_args(['-f', os.path.join(temp_dir, '*.md'), 's/a/A/'])
+      self.assertEqual(e.exception.type, ped.PedErrorTypes.PED_IO_ERROR)
+      self.assertIn('*.md: Error: file not found', err.getvalue())
+
+  def test_parallel(self):
+    import tempfile
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      temp_path = os.path.join(temp_dir, 'big.txt')
+      # big enough to be split into two chunks
+      with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(''.join(f'{n} foo é {"bar " * 50}\r\n' if n % 7 else '\n' for n in range(100000)))
+      for args in [['s/foo/X/', 'g/1|^$/', 'p/top', 'a/end'], ['-n', '-Z', 'x/9', 'u/x'], ['o/\\d+', 's/$/\\n/']]:
+        proc = subprocess.run([sys.executable, ped_path, '--parallel', '2', '-f', temp_path] + args, capture_output=True)
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(proc.stdout.decode(), run_args(['-f', temp_path] + args))
+    for args, error in [(['-M', '1', 's/a/b/'], '--max-substitutions and --max-count'),
+        (['i/2/x'], 'the "i/2/x" command'), (['S/a/b/'], 'the "S/a/b/" command'),
+        (['-Z', 's/a/\\n/'], 'the "s/a/\\n/" command can not run with --parallel and --no-eof'), ([], 'stdin')]:
+      with self.assertRaises(ped.PedError) as e:
+        run_piped(['--parallel', '2'] + args + ['s/c/d/'], 'abc\n')
+      self.assertIn(error, e.exception.msg)
+
+  def test_stats(self):
+    import json
+    import tempfile
+    with patch('sys.stderr', new=StringIO()) as err:
+      out = run_piped(['--stats-json', 's/a/b/', 'g/b', 'S/c/d/', 'y/0/1/x', 'd/-1/1'], 'ab\nc\naa\n')
+    self.assertEqual(out, 'x\n')
+    stats = json.loads(err.getvalue())
+    self.assertEqual([step['step'] for step in stats['steps']], ['line pass', 'whole buffer', 'line edits'])
+    line_pass, buffer, edits = stats['steps']
+    self.assertEqual((line_pass['lines_in'], line_pass['lines_out'], line_pass['conversion']), (3, 2, 'text to lines'))
+    self.assertEqual([(cmd['matches'], cmd['lines_in'], cmd['lines_out']) for cmd in line_pass['commands']],
+      [(3, 3, 3), (4, 3, 2)])
+    self.assertEqual((buffer['commands'][0]['matches'], buffer['bytes_in'], buffer['bytes_out']), (0, 6, 6))
+    self.assertEqual((edits['lines_in'], edits['lines_out'], edits['commands'][1]['lines_in']), (2, 1, None))
+    # every command has its own time, the edits made together on one table too
+    for step in stats['steps']:
+      for cmd in step['commands']:
+        self.assertGreaterEqual(min(cmd['wall_seconds'], cmd['cpu_seconds']), 0)
+    with patch('sys.stderr', new=StringIO()) as err:
+      run_piped(['--stats', 's/a/b/'], 'a\n')
+    self.assertIn("s 'a' -> 'b': ", err.getvalue())
+    self.assertRegex(err.getvalue(), r"s 'a' -> 'b': [\d.]+s, cpu [\d.]+s")
+    self.assertIn('1 matches, 1 -> 1 lines, 2 -> 2 bytes', err.getvalue())
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      run_piped(['--profile', os.path.join(temp_dir, 'ped.prof'), 's/a/b/'], 'a\n')
+      self.assertTrue(os.path.getsize(os.path.join(temp_dir, 'ped.prof')))
+
+  def test_edits(self):
+    import json
+    text = ''.join(f'line {n}\n' for n in range(20)) + 'end'
+    for opts in [[], ['--buffered']]:
+      out = json.loads(run_piped(opts + ['--edits', 'json', 's/^line 1$/one/', 'x/^line 1[5-8]'], text))
+      self.assertEqual(out['changed'], True)
+      self.assertEqual([(e['offset'], e['length'], e['line'], e['column'], e['end_line'], e['end_column'], e['text'])
+        for e in out['edits']], [(7, 6, 1, 0, 1, 6, 'one'), (110, 32, 15, 0, 19, 0, ''), (153, 0, 20, 3, 20, 3, '\n')])
+      out = run_piped(opts + ['--diff', 's/^line 1$/one/', 'x/^line 1[5-8]'], text)
+      self.assertEqual(out, '--- -\n+++ -\n@@ -1,5 +1,5 @@\n line 0\n-line 1\n+one\n line 2\n line 3\n line 4\n'
+        '@@ -13,9 +13,5 @@\n line 12\n line 13\n line 14\n-line 15\n-line 16\n-line 17\n-line 18\n line 19\n'
+        '-end\n\\ No newline at end of file\n+end\n')
+    out = json.loads(run_piped(['--edits', 'json', 'S/1\nline 2/X/'], 'line 1\nline 2\n'))
+    self.assertEqual(out['edits'], [{'offset': 5, 'length': 8, 'line': 0, 'column': 5, 'end_line': 1, 'end_column': 6,
+      'text': 'X'}])
+    out = run_piped(['-Z', '--diff', 's/x/y/'], text)
+    self.assertEqual(out, '')
+    # an empty line held back under -Z is no change
+    for opts in [[], ['--buffered']]:
+      self.assertEqual(run_piped(opts + ['-Z', '--diff', 's/q/X/'], 'a\n\nb'), '')
+      self.assertEqual(json.loads(run_piped(opts + ['-Z', '--edits', 'json', 'a/c'], 'a\n\nb'))['edits'],
+        [{'offset': 4, 'length': 0, 'line': 2, 'column': 1, 'end_line': 2, 'end_column': 1, 'text': '\nc'}])
+      self.assertEqual(run_piped(opts + ['-Z', '--diff', 's/b/X/'], 'a\n\nb'),
+        '--- -\n+++ -\n@@ -1,3 +1,3 @@\n a\n \n-b\n\\ No newline at end of file\n+X\n\\ No newline at end of file\n')
+
+  def test_serve(self):
+    import json
+    requests = [
+      {'id': 1, 'args': ['-i'], 'commands': ['s/fred/barney/', 'g/barney/'], 'text': 'Fred\nWilma\n'},
+      {'id': 'b', 'commands': ['s/(/x/'], 'text': 'a\n'},
+      {'commands': ['U/fred/'], 'path': short_path},
+      {'id': 4, 'args': ['-E'], 'commands': []},
+      {'id': 5, 'commands': ['s/xyz/a/'], 'text': 'a\n'},
+    ]
+    text = ''.join(json.dumps(request) + '\n' for request in requests) + '[]\n'
+    proc = subprocess.run([sys.executable, ped_path, '--serve'], input=text, capture_output=True, encoding='utf-8')
+    self.assertEqual(proc.returncode, 0)
+    responses = [json.loads(line) for line in proc.stdout.splitlines()]
+    self.assertEqual(len(responses), 6)
+    self.assertEqual(responses[0], {'id': 1, 'output': 'barney\n', 'changed': True})
+    self.assertEqual(responses[1]['id'], 'b')
+    self.assertEqual(responses[1]['type'], 'PED_RE_ERROR')
+    self.assertEqual(responses[1]['code'], 2)
+    self.assertEqual(responses[2]['output'], file_get_contents(short_path).replace('fred', 'FRED'))
+    self.assertIn('expected one argument', responses[3]['error'])
+    self.assertEqual(responses[4], {'id': 5, 'output': 'a\n', 'changed': False})
+    self.assertEqual(responses[5]['type'], 'PED_OTHER_ERROR')
+    requests = [
+      {'args': ['-h']},
+      {'paths': [short_path, abcdef_path], 'commands': ['s/fred/x/']},
+      {'args': ['-Z'], 'paths': [short_path, abcdef_path], 'commands': ['s/xyz/a/']},
+      {'paths': [os.path.join(data_path, 'missing.txt'), short_path], 'commands': ['s/fred/x/']},
+      {'commands': ['s/a/b/'], 'text': 'a\n'},
+    ]
+    proc = subprocess.run([sys.executable, ped_path, '--serve'], input=''.join(json.dumps(request) + '\n'
+      for request in requests), capture_output=True, encoding='utf-8')
+    self.assertEqual(proc.returncode, 0)
+    responses = [json.loads(line) for line in proc.stdout.splitlines()]
+    self.assertEqual(len(responses), 5)
+    self.assertTrue(responses[0]['output'].startswith('usage: '))
+    self.assertEqual(responses[0]['changed'], False)
+    self.assertEqual([response['changed'] for response in responses[1:3]], [True, False])
+    # a file that fails fails the request, the server goes on with the next one
+    self.assertEqual((responses[3]['type'], responses[3]['code']), ('PED_IO_ERROR', 1))
+    self.assertIn('1 of 2 files failed', responses[3]['error'])
+    self.assertIn('missing.txt: Error: file not found', responses[3]['messages'])
+    self.assertEqual(responses[4], {'output': 'b\n', 'changed': True})
+
+  def test_cache(self):
+    import json
+    import tempfile
+    text = 'abc\naXc\n'
+    requests = [
+      {'commands': ['s/a/b/'], 'text': text},
+      {'commands': ['s/a/b/', 'g/X'], 'text': text},
+      {'commands': ['s/a/b/', 'g/Xc', 'u/c'], 'text': text},
+      {'args': ['-i'], 'commands': ['s/a/b/', 'g/xc'], 'text': text},
+      {'commands': ['s/a/b/', 'g/Xc'], 'text': text.replace('c', 'd')},
+    ]
+    proc = subprocess.run([sys.executable, ped_path, '--serve', '--cache'], encoding='utf-8', capture_output=True,
+      input=''.join(json.dumps(request) + '\n' for request in requests))
+    responses = [json.loads(line) for line in proc.stdout.splitlines()]
+    self.assertEqual([response['output'] for response in responses], ['bbc\nbXc\n', 'bXc\n', 'bXC\n', 'bXc\n', ''])
+    self.assertEqual([response['cache']['reused'] for response in responses], [0, 1, 1, 0, 0])
+    self.assertEqual((responses[-1]['cache']['hits'], responses[-1]['cache']['misses']), (2, 3))
+    with tempfile.TemporaryDirectory('_test') as temp_dir:
+      map_path = os.path.join(temp_dir, 'map.tsv')
+      cache_dir = os.path.join(temp_dir, 'cache')
+      with open(map_path, 'w') as f:
+        f.write('b\tB\n')
+      args = ['--cache-dir', cache_dir, '--stats-json', f'm/{map_path}']
+      for opts, commands, reused, out in [([], ['s/c/C/'], 0, 'aBC\naXC\n'), ([], ['s/c/C/'], 2, 'aBC\naXC\n'),
+          ([], ['s/a/b/', 's/c/C/'], 1, 'bBC\nbXC\n'), (['-i'], ['s/C/D/'], 0, 'aBD\naXD\n')]:
+        with patch('sys.stderr', new=StringIO()) as err:
+          self.assertEqual(run_piped(opts + args + commands, text), out)
+        self.assertEqual(json.loads(err.getvalue())['cache']['reused'], reused)
+      # a changed map file is a different command
+      with open(map_path, 'w') as f:
+        f.write('b\tBee\n')
+      with patch('sys.stderr', new=StringIO()) as err:
+        self.assertEqual(run_piped(args + ['s/c/C/'], text), 'aBeeC\naXC\n')
+      self.assertEqual(json.loads(err.getvalue())['cache']['reused'], 0)
+
+  def test_quick_parse(self):
+    for argv in [[], ['s/a/b/'], ['-i', '-m', '-f', 'a', '--filepath=b', 's/a/', 'g/x/'], ['-b', 'bak', '-E', '\r\n',
+        '-Z', '-M', '3', '--timeout', '0.5', '--include', '*.py', '--include=*.txt', '--edits', 'json', '--stats'],
+        ['--force-color', '--no-color', '-e', '-f', '-', '--', 's/a/', '-x'], ['-E', '-', '']]:
+      self.assertEqual(vars(ped.quick_parse(argv)), vars(ped.get_parser().parse_args(argv)))
+    # left to argparse, which parses or reports them
+    for argv in [['s/a/', '-i'], ['-ie', 's/a/'], ['--ign', 's/a/'], ['-M5'], ['-M', '-1'], ['-M', 'x'],
+        ['--edits', 'xml'], ['-f'], ['--buffered=1'], ['--', 'a', '--'], ['-h']]:
+      self.assertIsNone(ped.quick_parse(argv))
+
+  def test_startup(self):
+    # the time a start takes is left to benchmarks/bench.py startup, the modules it loads are checked here
+    def imported(argv):
+      proc = subprocess.run([sys.executable, '-X', 'importtime', ped_path] + argv, stdin=subprocess.DEVNULL,
+        capture_output=True, encoding='utf-8')
+      return {line.split('|')[-1].strip() for line in proc.stderr.splitlines() if line.startswith('import time:')}
+    for argv in [['s/a/b/'], ['-f', short_path, 'S/a/b/'], ['-f', short_path, 'i/0/x', 'd/1/1']]:
+      modules = imported(argv)
+      self.assertIn('ped', modules)
+      for name in ['argparse', 'datetime', 'shutil', 'json', 'tempfile', 'textwrap', 'ped_engines']:
+        self.assertNotIn(name, modules, argv)
+    self.assertIn('ped_engines', imported(['-h']))
+
 if __name__ == '__main__':
     unittest.main()
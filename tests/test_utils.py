@@ -1,6 +1,5 @@
 import os
-from importlib.util import spec_from_loader, module_from_spec
-from importlib.machinery import SourceFileLoader
+import sys
 from io import StringIO
 from unittest.mock import patch 
 
@@ -13,9 +12,9 @@ short_uc_path = os.path.join(data_path, 'short_uc.txt')
 long_path = os.path.join(data_path, 'long.txt')
 
 ped_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ped')
-spec = spec_from_loader("ped", SourceFileLoader("ped",ped_path))
-ped = module_from_spec(spec)
-spec.loader.exec_module(ped)
+# the ped script runs the ped.py module next to it
+sys.path.insert(0, os.path.dirname(ped_path))
+import ped
 
 def run_args(args: list[str]):
   with patch('sys.stdout', new = StringIO()) as output: